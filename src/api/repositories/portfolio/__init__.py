@@ -1,3 +1,9 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
 from rdflib import SKOS
 from requests import RequestException
 from skosmos_client import SkosmosClient
@@ -5,11 +11,42 @@ from skosmos_client import SkosmosClient
 from django.conf import settings
 from django.core.cache import cache
 
+from general.cache import TieredCache
+
 CACHE_TIME = 86400  # 1 day
+LOCAL_CACHE_TIME = 300  # 5 minutes
+LOCAL_CACHE_SIZE = 10000
+
+# vocabulary data is requested very often but rarely changes, so we keep it in an
+# in-process cache in front of the redis cache
+vocabulary_cache = TieredCache(
+    cache, maxsize=LOCAL_CACHE_SIZE, local_timeout=LOCAL_CACHE_TIME
+)
 
 skosmos = SkosmosClient(api_base=settings.SKOSMOS_API)
 
-ACTIVE_TUPLES = []
+logger = logging.getLogger(__name__)
+
+# the local vocabulary snapshot, created by the vocabulary_snapshot command. it is
+# used before any cache or Skosmos request, and reloaded whenever the file changed
+snapshot = {
+    'version': None,
+    'collections': {},
+    'labels': {},
+}
+snapshot_state = {
+    'mtime': None,
+    'checked': None,
+}
+
+# lookup indices built from the collection members: schemas maps type URIs to the
+# schema of the active collection they belong to, member_sets maps collection URIs to
+# their members (with the time they were loaded). both are replaced as a whole
+# whenever they are rebuilt, so lookups never see a partially built index
+vocabulary_index = {
+    'schemas': {},
+    'member_sets': {},
+}
 
 # TODO: use i18n similar to portfolio
 LANGUAGES = ['de', 'en']
@@ -23,54 +60,133 @@ class FieldTransformerMissingError(Exception):
     pass
 
 
+def load_snapshot():
+    """Load the vocabulary snapshot file, if it was changed since the last load."""
+    if not settings.VOCABULARY_SNAPSHOT_FILE:
+        return
+    try:
+        mtime = os.stat(settings.VOCABULARY_SNAPSHOT_FILE).st_mtime
+    except OSError:
+        return
+    if mtime == snapshot_state['mtime']:
+        return
+    try:
+        with open(settings.VOCABULARY_SNAPSHOT_FILE) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        logger.exception('Could not load vocabulary snapshot')
+        return
+    snapshot['collections'] = data.get('collections', {})
+    snapshot['labels'] = data.get('labels', {})
+    # the snapshot is refreshed every night, so its version is derived from its
+    # content instead of its creation time
+    snapshot['version'] = hashlib.sha256(
+        json.dumps(
+            [snapshot['collections'], snapshot['labels']], sort_keys=True
+        ).encode()
+    ).hexdigest()
+    snapshot_state['mtime'] = mtime
+    return True
+
+
+def get_snapshot():
+    # check for a refreshed snapshot file from time to time
+    now = time.monotonic()
+    checked = snapshot_state['checked']
+    if checked is None or now - checked > LOCAL_CACHE_TIME:
+        snapshot_state['checked'] = now
+        if load_snapshot():
+            # the collections might have changed with the new snapshot
+            init()
+    return snapshot
+
+
+def get_vocabulary_version():
+    """Return a digest of the collections and labels of the vocabulary snapshot.
+
+    Without a snapshot, labels are requested from Skosmos and their changes
+    cannot be detected, in which case None is returned.
+    """
+    return get_snapshot()['version']
+
+
 def init():
+    """Build the vocabulary indices based on the active schemas' collections."""
+    load_snapshot()
+    schemas = {}
     for schema in settings.ACTIVE_SCHEMAS:
         members = get_collection_members(
             f'http://base.uni-ak.ac.at/portfolio/taxonomy/collection_{schema}'
         )
-        ACTIVE_TUPLES.append((members, schema))
+        for member in members:
+            # if a type is contained in several collections, the first active
+            # schema is used
+            schemas.setdefault(member, schema)
+    vocabulary_index['schemas'] = schemas
+    vocabulary_index['member_sets'] = {}
 
 
 def get_collection_members(collection, maxhits=1000, use_cache=True):
+    if use_cache and (members := get_snapshot()['collections'].get(collection)):
+        return members
+
     cache_key = f'get_collection_members_{collection}'
 
-    members = cache.get(cache_key) if use_cache else None
+    members = vocabulary_cache.get(cache_key) if use_cache else None
     if not members:
         m = skosmos.search(query='*', group=collection, maxhits=maxhits, lang='en')
         members = [i['uri'] for i in m]
 
         if members:
-            cache.set(cache_key, members, CACHE_TIME)
+            vocabulary_cache.set(cache_key, members, CACHE_TIME)
 
     return members or []
 
 
 def get_schema(entry_type):
-    for types, schema in ACTIVE_TUPLES:
-        if entry_type in types:
-            return schema
+    return vocabulary_index['schemas'].get(entry_type)
+
+
+def get_collection_member_set(collection):
+    """Return the members of a collection as a set, for fast membership tests.
+
+    The set is kept in memory and only rebuilt when the vocabulary indices
+    are rebuilt, or after LOCAL_CACHE_TIME seconds.
+    """
+    now = time.monotonic()
+    member_sets = vocabulary_index['member_sets']
+    entry = member_sets.get(collection)
+    if entry is None or now - entry[1] > LOCAL_CACHE_TIME:
+        entry = (frozenset(get_collection_members(collection)), now)
+        member_sets[collection] = entry
+    return entry[0]
 
 
 def get_altlabel(concept, project=settings.VOC_ID, graph=settings.VOC_GRAPH, lang=None):
     # TODO: use i18n similar to portfolio
     language = lang or 'en'
+    if labels := get_snapshot()['labels'].get(f'{graph}{concept}'):
+        return labels['alt'].get(language) or get_preflabel(
+            concept, project, graph, language
+        )
+
     cache_key = f'get_altlabel_{language}_{concept}'
 
-    label = cache.get(cache_key)
+    label = vocabulary_cache.get(cache_key)
     if not label:
         try:
             g = skosmos.data(f'{graph}{concept}')
             for _uri, l in g.subject_objects(SKOS.altLabel):
                 if l.language == language:
-                    label = l
+                    label = str(l)
                     break
         except RequestException:
             pass
 
-    label = label or get_preflabel(concept, project, graph, language)
+        label = label or get_preflabel(concept, project, graph, language)
 
-    if label:
-        cache.set(cache_key, label, CACHE_TIME)
+        if label:
+            vocabulary_cache.set(cache_key, label, CACHE_TIME)
 
     return label
 
@@ -93,9 +209,16 @@ def get_preflabel(
 ):
     # TODO: use i18n similar to portfolio
     language = lang or 'en'
+    if labels := get_snapshot()['labels'].get(f'{graph}{concept}'):
+        return (
+            labels['pref'].get(language)
+            or labels['pref'].get('de' if language == 'en' else 'en')
+            or ''
+        )
+
     cache_key = f'get_preflabel_{language}_{concept}'
 
-    label = cache.get(cache_key)
+    label = vocabulary_cache.get(cache_key)
     if not label:
         c = skosmos.get_concept(project, f'{graph}{concept}')
         try:
@@ -109,9 +232,29 @@ def get_preflabel(
             pass
 
         if label:
-            cache.set(cache_key, label, CACHE_TIME)
+            # store plain strings instead of rdflib Literals, which are more
+            # expensive to pickle
+            label = str(label)
+            vocabulary_cache.set(cache_key, label, CACHE_TIME)
 
     return label or ''
 
 
+def prefetch_labels(concepts, languages=LANGUAGES):
+    """Load the cached labels of several concepts with a single cache query.
+
+    Subsequent calls of get_altlabel, get_altlabel_collection and
+    get_preflabel for these concepts will then be served from the
+    in-process cache.
+    """
+    vocabulary_cache.get_many(
+        [
+            f'get_{kind}_{language}_{concept}'
+            for concept in concepts
+            for language in languages
+            for kind in ['altlabel', 'preflabel']
+        ]
+    )
+
+
 init()
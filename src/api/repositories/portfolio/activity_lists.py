@@ -1,8 +1,11 @@
 from django.conf import settings
 from django.db.models import F
-from django.db.models.functions import Greatest
 
-from api.repositories.portfolio import get_altlabel_collection, get_collection_members
+from api.repositories.portfolio import (
+    get_altlabel_collection,
+    get_collection_member_set,
+    prefetch_labels,
+)
 from api.repositories.portfolio.utils import (
     get_location_list_from_activity,
     get_role_label,
@@ -10,6 +13,7 @@ from api.repositories.portfolio.utils import (
     get_year_list_from_activity,
     role_fields,
 )
+from general.postgres import RangeUpper
 
 base_url = f'{settings.TAX_GRAPH}collection_'
 
@@ -82,8 +86,18 @@ def render_list_from_activities(activities, username):
     Portfolio backend docs section on
     [lists logic](https://portfolio-backend.readthedocs.io/en/latest/lists_logic.html)
     """
+    prefetch_labels(
+        [f'collection_{collection}' for collection in list_collections]
+        + [
+            f'collection_{collection}'
+            for collections in sub_collections.values()
+            for collection in collections
+        ]
+        + ['general_function_and_practice'],
+        [lang for (lang, _ll) in settings.LANGUAGES],
+    )
     types = {
-        collection: get_collection_members(f'{base_url}{collection}')
+        collection: get_collection_member_set(f'{base_url}{collection}')
         for collection in list_collections
     }
     labels = {
@@ -95,7 +109,7 @@ def render_list_from_activities(activities, username):
     }
     sub_types = {
         sub: {
-            collection: get_collection_members(f'{base_url}{collection}')
+            collection: get_collection_member_set(f'{base_url}{collection}')
             for collection in sub_collections[sub]
         }
         for sub in sub_collections
@@ -115,7 +129,7 @@ def render_list_from_activities(activities, username):
     # general function and practice is an exception and not prefixed with collection_
     sub_types['functions_practice'][
         'general_function_and_practice'
-    ] = get_collection_members(f'{settings.TAX_GRAPH}general_function_and_practice')
+    ] = get_collection_member_set(f'{settings.TAX_GRAPH}general_function_and_practice')
     for lang, _ll in settings.LANGUAGES:
         sub_labels[lang]['functions_practice'][
             'general_function_and_practice'
@@ -134,11 +148,7 @@ def render_list_from_activities(activities, username):
 
     # order activities by date, but creates duplicates
     activities = activities.annotate(
-        order_date=Greatest(
-            'datesearchindex__date',
-            'daterangesearchindex__date_from',
-            'daterangesearchindex__date_to',
-        )
+        order_date=RangeUpper('datesearchindex__date_range')
     ).order_by(F('order_date').desc(nulls_last=True))
 
     # because of duplictes, we need to keep track if we already
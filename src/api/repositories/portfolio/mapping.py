@@ -1,9 +1,17 @@
+import hashlib
+import json
 import logging
+from functools import lru_cache
 
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# increase this whenever the transformation functions or the vocabulary labels they
+# use change in a way that is not reflected in the mapping below, so that activities
+# which are republished unchanged are still transformed again
+TRANSFORM_VERSION = 1
+
 
 mapping = {
     '__none__': {
@@ -309,6 +317,17 @@ def map(schema):
     return mapping.get(schema)
 
 
+@lru_cache(maxsize=None)
+def get_mapping_version():
+    """Return a hash identifying the current mapping and vocabulary graphs."""
+    version = {
+        'transform_version': TRANSFORM_VERSION,
+        'mapping': mapping,
+        'vocabulary': [settings.TAX_GRAPH, settings.VOC_GRAPH],
+    }
+    return hashlib.sha256(json.dumps(version, sort_keys=True).encode()).hexdigest()
+
+
 search_mapping = {
     'default': {
         'title': 'title_subtitle',
@@ -2,14 +2,31 @@ import logging
 
 from django.conf import settings
 from django.core.cache import cache
+from django.db.models import Prefetch, Q, prefetch_related_objects
 
-from core.models import ShowroomObject
+from core.models import Media, ShowroomObject
 
 from . import get_schema
 from .mapping import map_search
 
 logger = logging.getLogger(__name__)
 
+# cached search items are versioned, so they can be kept for a longer time
+SEARCH_ITEM_CACHE_TIME = 60 * 60 * 24
+
+# large fields which are not needed to look up cached search items. querysets of
+# search results should defer them, they are loaded for cache misses only
+SEARCH_ITEM_DEFERRED_FIELDS = [
+    'source_repo_data',
+    'list',
+    'primary_details',
+    'secondary_details',
+    'locations',
+    'search_document_de',
+    'search_document_en',
+    'autocomplete_text',
+]
+
 
 def gather_labels(items):
     if not items:
@@ -17,129 +34,182 @@ def gather_labels(items):
     return [item.get('label') for item in items]
 
 
-def get_search_item(item, lang=settings.LANGUAGES[0][0]):
-    cache_key = f'get_search_item_{item.id}_{lang}'
-
-    search_item = cache.get(cache_key)
-    if not search_item:
-        search_item = {
-            'id': item.showroom_id,
-            'type': None,
-            'title': None,
-            'subtitle': None,
-            'description': None,
-            'alternative_text': [],
-            'image_url': None,
-            'source_institution': {
-                'label': item.source_repo.label_institution,
-                'url': item.source_repo.url_institution,
-                'icon': item.source_repo.icon,
-            },
-            'score': 0,
-        }
-        if hasattr(item, 'rank'):
-            search_item['score'] = item.rank
-
-        if item.type == ShowroomObject.ACTIVITY:
-            search_item['type'] = 'activity'
-        elif item.type == ShowroomObject.ALBUM:
-            search_item['type'] = 'album'
-        else:
-            # TODO: refactor this (also in entity serializer, to be configurable)
-            if item.type == ShowroomObject.PERSON:
-                search_item['type'] = 'person'
-            elif item.type == ShowroomObject.INSTITUTION:
-                search_item['type'] = 'institution'
-            elif item.type == ShowroomObject.DEPARTMENT:
-                search_item['type'] = 'department'
-
-        if item.type == ShowroomObject.ACTIVITY:
-            # in case a featured medium is set, we'll use this, if there is a usable
-            # thumbnail or cover image. otherwise we take the first medium according to
-            # the given ordering, that has a usable thumbnail or cover image
-            media = item.media_set.all().order_by('-featured', 'order')
-            for medium in media:
-                if thumbnail := medium.specifics.get('thumbnail'):
-                    search_item['image_url'] = thumbnail
-                    break
-                elif medium.type == 'v':
-                    if cover := medium.specifics.get('cover'):
-                        if cover_jpg := cover.get('jpg'):
-                            search_item['image_url'] = cover_jpg
-                            break
-        elif item.type in [
-            ShowroomObject.PERSON,
-            ShowroomObject.DEPARTMENT,
-            ShowroomObject.INSTITUTION,
-        ]:
-            photo = item.entitydetail.photo
-            search_item['image_url'] = photo if photo else None
-
-        activity_schema = None
+def get_search_items(items, lang=settings.LANGUAGES[0][0]):
+    """Return the search items of a list of showroom objects.
+
+    All cached items are fetched at once, only the missing ones are rendered and
+    then also cached at once. The cache keys contain the objects' cache_version,
+    so changed objects are always rendered anew.
+    """
+    cache_keys = [
+        f'get_search_item_{item.id}_{item.cache_version}_{lang}' for item in items
+    ]
+    cached = cache.get_many(cache_keys)
+    prefetch_search_item_data(
+        [item for item, key in zip(items, cache_keys) if key not in cached]
+    )
+    missing = {}
+    search_items = []
+    for item, cache_key in zip(items, cache_keys):
+        if (search_item := cached.get(cache_key)) is None:
+            search_item = render_search_item(item, lang)
+            missing[cache_key] = search_item
+        # the score depends on the search, so it is not cached
+        search_items.append(
+            {**search_item, 'score': item.rank if hasattr(item, 'rank') else 0}
+        )
+    if missing:
+        cache.set_many(missing, SEARCH_ITEM_CACHE_TIME)
+    return search_items
+
+
+def prefetch_search_item_data(items):
+    """Load all data needed to render the search items of showroom objects.
+
+    Deferred source repo data is loaded with one query and all related objects
+    are prefetched, so the number of queries does not depend on the number of
+    items.
+    """
+    if not items:
+        return
+    deferred = [
+        item for item in items if 'source_repo_data' in item.get_deferred_fields()
+    ]
+    if deferred:
+        source_repo_data = dict(
+            ShowroomObject.objects.filter(
+                id__in=[item.id for item in deferred]
+            ).values_list('id', 'source_repo_data')
+        )
+        for item in deferred:
+            item.source_repo_data = source_repo_data[item.id]
+    # only media with a thumbnail or a video cover can be used as preview image
+    preview_media = Media.objects.filter(
+        Q(specifics__has_key='thumbnail')
+        | Q(type=Media.VIDEO, specifics__cover__has_key='jpg')
+    ).order_by('-featured', 'order')
+    prefetch_related_objects(
+        items,
+        'source_repo',
+        'activitydetail',
+        'entitydetail',
+        Prefetch('media_set', queryset=preview_media, to_attr='preview_media'),
+    )
+
+
+def render_search_item(item, lang):
+    """Render the search item of a showroom object, without its score."""
+    search_item = {
+        'id': item.showroom_id,
+        'type': None,
+        'title': None,
+        'subtitle': None,
+        'description': None,
+        'alternative_text': [],
+        'image_url': None,
+        'source_institution': {
+            'label': item.source_repo.label_institution,
+            'url': item.source_repo.url_institution,
+            'icon': item.source_repo.icon,
+        },
+        'score': 0,
+    }
+    if item.type == ShowroomObject.ACTIVITY:
+        search_item['type'] = 'activity'
+    elif item.type == ShowroomObject.ALBUM:
+        search_item['type'] = 'album'
+    else:
+        # TODO: refactor this (also in entity serializer, to be configurable)
+        if item.type == ShowroomObject.PERSON:
+            search_item['type'] = 'person'
+        elif item.type == ShowroomObject.INSTITUTION:
+            search_item['type'] = 'institution'
+        elif item.type == ShowroomObject.DEPARTMENT:
+            search_item['type'] = 'department'
+
+    if item.type == ShowroomObject.ACTIVITY:
+        # in case a featured medium is set, we'll use this, if there is a usable
+        # thumbnail or cover image. otherwise we take the first medium according to
+        # the given ordering, that has a usable thumbnail or cover image
+        for medium in item.preview_media:
+            if thumbnail := medium.specifics.get('thumbnail'):
+                search_item['image_url'] = thumbnail
+                break
+            elif medium.type == 'v':
+                if cover := medium.specifics.get('cover'):
+                    if cover_jpg := cover.get('jpg'):
+                        search_item['image_url'] = cover_jpg
+                        break
+    elif item.type in [
+        ShowroomObject.PERSON,
+        ShowroomObject.DEPARTMENT,
+        ShowroomObject.INSTITUTION,
+    ]:
+        photo = item.entitydetail.photo
+        search_item['image_url'] = photo if photo else None
+
+    activity_schema = None
+    if (
+        item.type == ShowroomObject.ACTIVITY
+        and item.activitydetail
+        and item.activitydetail.activity_type
+    ):
+        activity_schema = get_schema(item.activitydetail.activity_type.get('source'))
+    mapping = map_search(search_item['type'], activity_schema)
+
+    functions = {
+        'activity_type_university': get_activity_type_university,
+        'architecture_contributors': get_architecture_contributors,
+        'artists_contributors': get_artists_contributors,
+        'artists_curators_contributors': get_artists_curators_contributors,
+        'authors_artists_contributors': get_authors_artists_contributors,
+        'authors_editors': get_authors_editors,
+        'contributors': get_contributors,
+        'design_contributors': get_design_contributors,
+        'developers_contributors': get_developers_contributors,
+        'directors_contributors': get_directors_contributors,
+        'fellow_scholar_funding': get_fellow_scholar_funding,
+        'lecturers_contributors': get_lecturers_contributors,
+        'music_conductors_composition_contributors': get_music_conductors_composition_contributors,
+        'name': get_name,
+        'organisers_artists_curators': get_organisers_artists_curators,
+        'organisers_lecturers_contributors': get_organisers_lecturers_contributors,
+        'project_lead_partners_funding': get_project_lead_partners_funding,
+        'skills': get_skills,
+        'text_keywords': get_text_keywords,
+        'title_subtitle': get_title_subtitle,
+        'university': get_university,
+        'winners_jury_contributors': get_winners_jury_contributors,
+    }
+    entry_data_independent = ['title_subtitle', 'name', 'university', 'skills']
+
+    for field, map_function in mapping.items():
+        if map_function is None:
+            continue
+        if (transform_func := functions.get(map_function)) is None:
+            if settings.DEBUG:
+                # TODO: discuss: do we want this also in prod, or an admin notification?
+                logger.error(
+                    f'Missing search mapping function: {{{field!r}: {map_function!r}}}'
+                )
+            continue
         if (
             item.type == ShowroomObject.ACTIVITY
-            and item.activitydetail
-            and item.activitydetail.activity_type
+            and type(item.source_repo_data.get('data')) is not dict
         ):
-            activity_schema = get_schema(
-                item.activitydetail.activity_type.get('source')
-            )
-        mapping = map_search(search_item['type'], activity_schema)
-
-        functions = {
-            'activity_type_university': get_activity_type_university,
-            'architecture_contributors': get_architecture_contributors,
-            'artists_contributors': get_artists_contributors,
-            'artists_curators_contributors': get_artists_curators_contributors,
-            'authors_artists_contributors': get_authors_artists_contributors,
-            'authors_editors': get_authors_editors,
-            'contributors': get_contributors,
-            'design_contributors': get_design_contributors,
-            'developers_contributors': get_developers_contributors,
-            'directors_contributors': get_directors_contributors,
-            'fellow_scholar_funding': get_fellow_scholar_funding,
-            'lecturers_contributors': get_lecturers_contributors,
-            'music_conductors_composition_contributors': get_music_conductors_composition_contributors,
-            'name': get_name,
-            'organisers_artists_curators': get_organisers_artists_curators,
-            'organisers_lecturers_contributors': get_organisers_lecturers_contributors,
-            'project_lead_partners_funding': get_project_lead_partners_funding,
-            'skills': get_skills,
-            'text_keywords': get_text_keywords,
-            'title_subtitle': get_title_subtitle,
-            'university': get_university,
-            'winners_jury_contributors': get_winners_jury_contributors,
-        }
-        entry_data_independent = ['title_subtitle', 'name', 'university', 'skills']
-
-        for field, map_function in mapping.items():
-            if map_function is None:
-                continue
-            if (transform_func := functions.get(map_function)) is None:
-                if settings.DEBUG:
-                    # TODO: discuss: do we want this also in prod, or an admin notification?
-                    logger.error(
-                        f'Missing search mapping function: {{{field!r}: {map_function!r}}}'
-                    )
+            logger.warning(f'source_repo_data[\'data\'] is not a dict for {item}')
+            # if the current transformation relies on a data dict, go to next one
+            if map_function not in entry_data_independent:
                 continue
-            if (
-                item.type == ShowroomObject.ACTIVITY
-                and type(item.source_repo_data.get('data')) is not dict
-            ):
-                logger.warning(f'source_repo_data[\'data\'] is not a dict for {item}')
-                # if the current transformation relies on a data dict, go to next one
-                if map_function not in entry_data_independent:
-                    continue
-            transformed = transform_func(item, lang)
-            # TODO: discuss: should we actually just filter out None values or should
-            #       we try to get a default value instead, if the localised is not available?
-            transformed = [item for item in transformed if item]
-
-            if field == 'alternative_text':
-                search_item[field] = transformed
-            else:
-                search_item[field] = ', '.join(transformed)
-        cache.set(cache_key, search_item, 60 * 5)
+        transformed = transform_func(item, lang)
+        # TODO: discuss: should we actually just filter out None values or should
+        #       we try to get a default value instead, if the localised is not available?
+        transformed = [item for item in transformed if item]
+
+        if field == 'alternative_text':
+            search_item[field] = transformed
+        else:
+            search_item[field] = ', '.join(transformed)
 
     return search_item
 
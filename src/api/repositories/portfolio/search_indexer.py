@@ -2,14 +2,24 @@ import datetime
 import logging
 import re
 
+from django_rq import get_queue
+from psycopg2.extras import DateRange
+from rq.exceptions import NoSuchJobError
+from rq.registry import ScheduledJobRegistry
+
 from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
 
 from core.models import (
-    DateRangeSearchIndex,
     DateRelevanceIndex,
     DateSearchIndex,
+    ShowroomObject,
     TextSearchIndex,
 )
+from general.postgres import IsDistinctFrom, SearchVectorJSON
 
 from . import get_schema
 from .mapping import map_indexer
@@ -18,7 +28,222 @@ from .utils import role_fields
 logger = logging.getLogger(__name__)
 
 
+def enqueue_index_job(activity_id):
+    """Schedule the search indexing of an activity.
+
+    The job is delayed and identified by the activity id, so several
+    pushes of the same activity within the configured delay only
+    result in a single indexing run. Until the job has run, the
+    activity's index_pending property is True.
+    """
+    job_id = f'activity_index_{activity_id}'
+    queue = get_queue('default')
+    registry = ScheduledJobRegistry(queue=queue)
+    if job_id in registry:
+        try:
+            registry.remove(job_id, delete_job=True)
+        except NoSuchJobError:
+            pass
+    queue.enqueue_in(
+        datetime.timedelta(seconds=settings.WORKER_DELAY_INDEX),
+        index_activity_job,
+        activity_id,
+        job_id=job_id,
+    )
+
+
+def index_activity_job(activity_id):
+    try:
+        activity = ShowroomObject.active_objects.get(
+            id=activity_id, type=ShowroomObject.ACTIVITY
+        )
+    except ShowroomObject.DoesNotExist:
+        # the activity might have been deactivated in the meantime
+        return
+    index_activity(activity)
+
+
 def index_activity(activity):
+    index_activities([activity])
+
+
+def index_activities(activities):
+    """Build the text and date search indices for a set of activities.
+
+    All index values are collected first and compared to the stored index rows
+    of all activities, so that only changed rows are written and the number of
+    queries does not depend on the number of activities.
+    """
+    date_indexed_at = timezone.now()
+    text_indices = []
+    date_indices = []
+    relevance_indices = []
+    date_indexed = []
+    today = datetime.date.today()
+    for activity in activities:
+        for lang, values in get_text_index_values(activity).items():
+            text_indices.append(
+                TextSearchIndex(
+                    showroom_object=activity, language=lang, text='; '.join(values)
+                )
+            )
+        if (date_values := get_date_index_values(activity)) is None:
+            continue
+        date_indexed.append(activity)
+        dates = []
+        for date_from, date_to in date_values:
+            try:
+                date_from = datetime.date.fromisoformat(date_from)
+                date_to = datetime.date.fromisoformat(date_to)
+            except ValueError:
+                logger.warning(
+                    f'could not index invalid date {date_from} - {date_to} of activity {activity.id}'
+                )
+                continue
+            date_indices.append(
+                DateSearchIndex(
+                    showroom_object=activity,
+                    date_range=DateRange(date_from, date_to, '[]'),
+                )
+            )
+            dates.append(date_from)
+            if date_to != date_from:
+                dates.append(date_to)
+        relevance_indices.extend(
+            [
+                DateRelevanceIndex(
+                    showroom_object=activity,
+                    date=d,
+                    rank=DateRelevanceIndex.calculate_rank(d, today),
+                )
+                for d in dates
+            ]
+        )
+
+    with transaction.atomic():
+        sync_index_rows(
+            TextSearchIndex.objects.filter(showroom_object__in=activities),
+            text_indices,
+            get_text_index_key,
+            ['text'],
+        )
+        update_search_documents(
+            ShowroomObject.objects.filter(
+                id__in=[activity.id for activity in activities]
+            )
+        )
+        # date indices are only replaced for activities that provide inner data
+        if date_indexed:
+            sync_index_rows(
+                DateSearchIndex.objects.filter(showroom_object__in=date_indexed),
+                date_indices,
+                get_date_index_key,
+            )
+            changed, deleted = sync_index_rows(
+                DateRelevanceIndex.objects.filter(showroom_object__in=date_indexed),
+                relevance_indices,
+                get_relevance_index_key,
+                ['rank'],
+            )
+            if ranked := {index.showroom_object_id for index in changed + deleted}:
+                ShowroomObject.update_currentness_ranks(
+                    ShowroomObject.objects.filter(id__in=ranked)
+                )
+        ShowroomObject.objects.filter(
+            id__in=[activity.id for activity in activities]
+        ).update(date_indexed=date_indexed_at)
+
+
+def sync_index_rows(queryset, indices, get_key, fields=()):
+    """Write the minimal changes to turn the index rows of a queryset into indices.
+
+    Index rows are matched by the key returned from get_key. Rows with a new key
+    are created, rows with changes in the given fields are updated and all
+    other stored rows are deleted. Returns a tuple of the created and updated
+    rows and of the deleted rows.
+    """
+    model = queryset.model
+    stored = {}
+    deleted = []
+    for index in queryset:
+        # superfluous rows with the same key are removed
+        if get_key(index) in stored:
+            deleted.append(index)
+        else:
+            stored[get_key(index)] = index
+    created = []
+    updated = []
+    for key, index in {get_key(index): index for index in indices}.items():
+        if (stored_index := stored.pop(key, None)) is None:
+            created.append(index)
+        elif any(getattr(stored_index, f) != getattr(index, f) for f in fields):
+            for f in fields:
+                setattr(stored_index, f, getattr(index, f))
+            updated.append(stored_index)
+    deleted.extend(stored.values())
+
+    if deleted:
+        model.objects.filter(id__in=[index.id for index in deleted]).delete()
+    if created:
+        model.objects.bulk_create(created)
+    if updated:
+        model.objects.bulk_update(updated, fields)
+    return created + updated, deleted
+
+
+def get_text_index_key(index):
+    return index.showroom_object_id, index.language
+
+
+def get_date_index_key(index):
+    # date ranges read from the database have an exclusive upper bound
+    date_range = index.date_range
+    date_to = date_range.upper
+    if not date_range.upper_inc:
+        date_to -= datetime.timedelta(days=1)
+    return index.showroom_object_id, date_range.lower, date_to
+
+
+def get_relevance_index_key(index):
+    return index.showroom_object_id, index.date
+
+
+def get_search_document(lang):
+    """Return the expression for the weighted search document of a language.
+
+    Titles are weighted highest, followed by subtexts and the text search index.
+    """
+    config = settings.SEARCH_CONFIGS.get(lang, 'simple')
+    text = Subquery(
+        TextSearchIndex.objects.filter(
+            showroom_object=OuterRef('pk'), language=lang
+        ).values('text')[:1]
+    )
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVectorJSON('subtext', weight='B', config=config)
+        + SearchVector(text, weight='C', config=config)
+    )
+
+
+def update_search_documents(showroom_objects):
+    """Compute the search documents of a queryset of showroom objects.
+
+    Only objects with a stored document differing from the computed one are
+    written, so reindexing unchanged objects does not rewrite their rows and
+    search document indices. Returns the number of updated objects.
+    """
+    documents = {
+        ShowroomObject.search_document_field(lang): get_search_document(lang)
+        for lang, _lang_label in settings.LANGUAGES
+    }
+    changed = Q()
+    for field, document in documents.items():
+        changed |= Q(IsDistinctFrom(F(field), document))
+    return showroom_objects.filter(changed).update(**documents)
+
+
+def get_text_index_values(activity):
     data = activity.source_repo_data
 
     indexed = {}
@@ -73,107 +298,93 @@ def index_activity(activity):
                         if res := indexer_result.get(lang):
                             indexed[lang].append(res)
 
-    # clear all old text search index values for this activity before creating new ones
-    TextSearchIndex.objects.filter(showroom_object=activity).delete()
-    for lang, values in indexed.items():
-        search_index = TextSearchIndex.objects.create(
-            showroom_object=activity, language=lang
-        )
-        search_index.text = '; '.join(values)
-        search_index.save()
+    return indexed
 
-    # now do the date related indexing
-    if inner_data and type(inner_data) is dict:
-        dates = []
-        date_ranges = []
-        # collect all possible dates and date locations
-        if date := inner_data.get('date'):
-            append_date(date, dates, date_ranges)
-        if award_ceremony := inner_data.get('award_ceremony'):
-            if date := award_ceremony.get('date'):
-                append_date(date, dates, date_ranges)
-        if d := inner_data.get('date_location'):
-            for dl in d:
-                if date := dl.get('date'):
-                    append_date(date, dates, date_ranges)
-        if d := inner_data.get('date_location_description'):
-            for dl in d:
-                if date := dl.get('date'):
-                    append_date(date, dates, date_ranges)
-        if d := inner_data.get('date_opening_location'):
-            for dl in d:
-                if date := dl.get('date'):
-                    append_date_range(date, dates, date_ranges)
-                if opening := dl.get('opening'):
-                    if date := opening.get('date'):
-                        append_date(date, dates, date_ranges)
-        if date := inner_data.get('date_range'):
-            append_date_range(date, dates, date_ranges)
-        if d := inner_data.get('date_range_location'):
-            for dl in d:
-                if date := dl.get('date'):
-                    append_date_range(date, dates, date_ranges)
-        if d := inner_data.get('date_range_time_range_location'):
-            for dl in d:
-                if date := dl.get('date'):
-                    append_date_range(date, dates, date_ranges)
-        if d := inner_data.get('date_time_range_location'):
-            for dl in d:
-                if date := dl.get('date'):
-                    append_date(date.get('date'), dates, date_ranges)
-        # clear all old search index values for this activity
-        DateSearchIndex.objects.filter(showroom_object=activity).delete()
-        DateRangeSearchIndex.objects.filter(showroom_object=activity).delete()
-        DateRelevanceIndex.objects.filter(showroom_object=activity).delete()
-        # store the collected dates and date ranges as new search index values
-        DateSearchIndex.objects.bulk_create(
-            [DateSearchIndex(showroom_object=activity, date=date) for date in dates]
-        )
-        DateRangeSearchIndex.objects.bulk_create(
-            [
-                DateRangeSearchIndex(
-                    showroom_object=activity, date_from=dr[0], date_to=dr[1]
-                )
-                for dr in date_ranges
-            ]
-        )
-        dates.extend([dr[0] for dr in date_ranges])
-        dates.extend([dr[1] for dr in date_ranges])
-        inserted = DateRelevanceIndex.objects.bulk_create(
-            [DateRelevanceIndex(showroom_object=activity, date=d) for d in dates]
-        )
-        today = datetime.date.today()
-        for dr in inserted:
-            dr.update_rank(today)
+
+def get_date_index_values(activity):
+    """Collect all dates and date ranges of an activity.
+
+    Returns a list of (date_from, date_to) tuples, in which single dates have
+    the same date_from and date_to, or None if the activity has no inner data
+    which could be indexed.
+    """
+    inner_data = activity.source_repo_data.get('data')
+    if not inner_data or type(inner_data) is not dict:
+        return None
+
+    date_ranges = []
+    # collect all possible dates and date locations
+    if date := inner_data.get('date'):
+        append_date(date, date_ranges)
+    if award_ceremony := inner_data.get('award_ceremony'):
+        if date := award_ceremony.get('date'):
+            append_date(date, date_ranges)
+    if d := inner_data.get('date_location'):
+        for dl in d:
+            if date := dl.get('date'):
+                append_date(date, date_ranges)
+    if d := inner_data.get('date_location_description'):
+        for dl in d:
+            if date := dl.get('date'):
+                append_date(date, date_ranges)
+    if d := inner_data.get('date_opening_location'):
+        for dl in d:
+            if date := dl.get('date'):
+                append_date_range(date, date_ranges)
+            if opening := dl.get('opening'):
+                if date := opening.get('date'):
+                    append_date(date, date_ranges)
+    if date := inner_data.get('date_range'):
+        append_date_range(date, date_ranges)
+    if d := inner_data.get('date_range_location'):
+        for dl in d:
+            if date := dl.get('date'):
+                append_date_range(date, date_ranges)
+    if d := inner_data.get('date_range_time_range_location'):
+        for dl in d:
+            if date := dl.get('date'):
+                append_date_range(date, date_ranges)
+    if d := inner_data.get('date_time_range_location'):
+        for dl in d:
+            if date := dl.get('date'):
+                append_date(date.get('date'), date_ranges)
+    return date_ranges
 
 
 def index_entity(entity):
     indexed = {}
     for lang, _lang_label in settings.LANGUAGES:
-        indexed[lang] = []
+        indexed[lang] = [entity.title]
 
     # index keywords
     if entity.entitydetail.expertise and type(entity.entitydetail.expertise) is dict:
         for lang in entity.entitydetail.expertise.keys():
             indexed[lang].extend(entity.entitydetail.expertise[lang])
 
-    # now flatten the indexed item to a string and store them on the index table
-    for lang, values in indexed.items():
-        search_index, created = TextSearchIndex.objects.get_or_create(
-            showroom_object=entity, language=lang
+    # now flatten the indexed item to a string and store only changed texts
+    text_indices = [
+        TextSearchIndex(showroom_object=entity, language=lang, text='; '.join(values))
+        for lang, values in indexed.items()
+    ]
+    with transaction.atomic():
+        sync_index_rows(
+            TextSearchIndex.objects.filter(showroom_object=entity),
+            text_indices,
+            get_text_index_key,
+            ['text'],
         )
-        search_index.text = '; '.join(values)
-        search_index.save()
+        update_search_documents(ShowroomObject.objects.filter(id=entity.id))
+        ShowroomObject.objects.filter(id=entity.id).update(date_indexed=timezone.now())
 
 
-def append_date(date, dates, date_ranges):
+def append_date(date, date_ranges):
     if re.match(r'^[0-9]{4}-[0-9]{2}-[0-9]{2}$', date):
-        dates.append(date)
+        date_ranges.append((date, date))
     elif re.match(r'^[0-9]{4}$', date):
         date_ranges.append((f'{date}-01-01', f'{date}-12-31'))
 
 
-def append_date_range(date_range, dates, date_ranges):
+def append_date_range(date_range, date_ranges):
     date_from = date_range.get('date_from')
     date_to = date_range.get('date_to')
     if date_from and date_to:
@@ -181,11 +392,12 @@ def append_date_range(date_range, dates, date_ranges):
             date_from = f'{date_from}-01-01'
         if re.match(r'^[0-9]{4}$', date_to):
             date_to = f'{date_to}-12-31'
-        date_ranges.append((date_from, date_to))
+        # ranges with a lower bound after their upper bound are rejected by postgres
+        date_ranges.append((min(date_from, date_to), max(date_from, date_to)))
     elif date_from:
-        append_date(date_from, dates, date_ranges)
+        append_date(date_from, date_ranges)
     elif date_to:
-        append_date(date_to, dates, date_ranges)
+        append_date(date_to, date_ranges)
 
 
 def get_index(indexer, data):
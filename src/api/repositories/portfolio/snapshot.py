@@ -0,0 +1,60 @@
+import json
+import os
+from datetime import datetime
+
+from rdflib import RDF, SKOS
+
+from django.conf import settings
+
+from . import get_collection_members, init, skosmos
+
+
+def create_snapshot():
+    """Export the vocabulary and taxonomy data used by showroom.
+
+    Returns a dict containing the members of all collections in the
+    taxonomy, as well as the preferred and alternative labels of all
+    concepts in the taxonomy and vocabulary, by language.
+    """
+    labels = {}
+    collections = {}
+    for vocid in [settings.TAX_ID, settings.VOC_ID]:
+        # without a uri Skosmos returns the data of the whole vocabulary
+        graph = skosmos.data(None, vocid=vocid)
+        for kind, predicate in [('pref', SKOS.prefLabel), ('alt', SKOS.altLabel)]:
+            for uri, label in graph.subject_objects(predicate):
+                concept = labels.setdefault(str(uri), {'pref': {}, 'alt': {}})
+                concept[kind].setdefault(label.language, str(label))
+        if vocid == settings.TAX_ID:
+            for uri in graph.subjects(RDF.type, SKOS.Collection):
+                collections[str(uri)] = get_collection_members(
+                    str(uri), use_cache=False
+                )
+    return {
+        'created': datetime.now().isoformat(),
+        'collections': collections,
+        'labels': labels,
+    }
+
+
+def export_snapshot(path=None):
+    """Create a new vocabulary snapshot and write it to the snapshot file.
+
+    Returns None without contacting Skosmos, if no snapshot file is configured.
+    """
+    path = path or settings.VOCABULARY_SNAPSHOT_FILE
+    if not path:
+        return None
+    data = create_snapshot()
+    if directory := os.path.dirname(path):
+        os.makedirs(directory, exist_ok=True)
+    # write to a temporary file first, so running processes never load a
+    # partially written snapshot
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    if path == settings.VOCABULARY_SNAPSHOT_FILE:
+        # load the new snapshot and rebuild the vocabulary indices right away
+        init()
+    return data
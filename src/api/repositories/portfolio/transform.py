@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 import logging
+from contextvars import ContextVar
 
-from django.conf import settings
+from django_rq import get_queue
+
+from django.db import transaction
+from django.db.models import F
 
 from core.models import ShowroomObject
 from general.datetime.utils import (
@@ -17,108 +21,144 @@ from . import (
     MappingNotFoundError,
     get_altlabel,
     get_preflabel,
+    get_schema,
+    prefetch_labels,
 )
-from .mapping import map
+from .mapping import mapping
 
 logger = logging.getLogger(__name__)
 
+# the entities resolved for the transformation that is currently running, as a dict
+# of source_repo_object_id to (title, showroom_id) tuples
+resolved_entities = ContextVar('resolved_entities', default=None)
+
+
+def transform_data(data, schema, entities=None):
+    """Transform the repo data of an activity based on the schema's mapping.
 
-def transform_data(data, schema):
-    mapping = map(schema)
-    if not mapping:
+    All entities referenced in the data are resolved with a single query
+    before the fields are transformed. When several activities are
+    transformed in a row, the entities can also be resolved upfront with
+    resolve_entities and passed in.
+    """
+    plan = transform_plans.get(schema)
+    if not plan:
         logger.error(f'No mapping is available to transform entry of type: {schema}')
         raise MappingNotFoundError(schema)
+    if missing := missing_transformers.get(schema):
+        raise FieldTransformerMissingError(missing[0])
 
-    transformed = {}
-    for category, fields in mapping.items():
-        transformed[category] = []
-        for field in fields:
-            if type(tf := transform_field(field, data)) == list:
-                transformed[category].extend(tf)
-            elif tf:
-                transformed[category].append(tf)
+    if entities is None:
+        entities = resolve_entities([data])
+    token = resolved_entities.set(entities)
+    try:
+        transformed = {}
+        for category, transformers in plan:
+            transformed[category] = []
+            for transformer in transformers:
+                if type(tf := transformer(data)) == list:
+                    transformed[category].extend(tf)
+                elif tf:
+                    transformed[category].append(tf)
+    finally:
+        resolved_entities.reset(token)
     return transformed
 
 
-def transform_field(field, data):
-    functions = {
-        'architecture': get_architecture,
-        'artists': get_artists,
-        'authors': get_authors,
-        'award_ceremony_location_description': get_award_ceremony_location_description,
-        'award_date': get_award_date,
-        'category': get_category,
-        'combined_locations': get_combined_locations,
-        'composition': get_composition,
-        'commissions': get_commissions,
-        'conductors': get_conductors,
-        'contributors': get_contributors,
-        'curators': get_curators,
-        'date': get_date,
-        'date_location': get_date_location,
-        'date_location_description': get_date_location_description,
-        'date_opening_location': get_date_opening_location,
-        'date_range': get_date_range,
-        'date_range_location': get_date_range_location,
-        'date_range_time_range_location': get_date_range_time_range_location,
-        'date_time_range_location': get_date_time_range_location,
-        'design': get_design,
-        'dimensions': get_dimensions,
-        'directors': get_directors,
-        'documentation_url': get_documentation_url,
-        'duration': get_duration,
-        'editors': get_editors,
-        'fellow': get_fellow,
-        'format': get_format,
-        'funding': get_funding,
-        'funding_category': get_funding_category,
-        'git_url': get_git_url,
-        'granted_by': get_granted_by,
-        'headline': get_headline,
-        'isan': get_isan,
-        'isbn_doi': get_isbn_doi,
-        'jury': get_jury,
-        'keywords': get_keywords,
-        'language': get_language,
-        'language_format_material_edition': get_language_format_material_edition,
-        'lecturers': get_lecturers,
-        'list_contributors': list_contributors,
-        'list_published_in': list_published_in,
-        'material': get_material,
-        'material_format': get_material_format,
-        'material_format_dimensions': get_material_format_dimensions,
-        'music': get_music,
-        'open_source_license': get_open_source_license,
-        'opening': get_opening,
-        'organisations': get_organisations,
-        'organisers': get_organisers,
-        'programming_language': get_programming_language,
-        'project_lead': get_project_lead,
-        'project_partners': get_project_partners,
-        'published_in': get_published_in,
-        'publisher_place_date': get_publisher_place_date,
-        'software_developers': get_software_developers,
-        'software_version': get_software_version,
-        'status': get_status,
-        'texts_with_types': get_texts_with_types,
-        'title_of_event': get_title_of_event,
-        'type': get_type,
-        'url': get_url,
-        'volume_issue_pages': get_volume_issue_pages,
-        'winners': get_winners,
-    }
+def resolve_entities(data_list):
+    """Resolve all entities referenced in the given repo data at once.
 
-    field_transformer = functions.get(field)
-    # TODO: remove this after all (current) field transformations have been implemented
-    #       and replace with an Exception / log line / admin mail notification(?)
-    if settings.DEBUG and not field_transformer:
-        logger.error(
-            f'No transformation function is available for field: {{{field!r}: {data.get(field)!r}}}'
+    Collects the sources of all objects in the data and returns a dict
+    of source_repo_object_id to (title, showroom_id) tuples for those,
+    which refer to an active showroom object.
+    """
+    sources = set()
+    for data in data_list:
+        if type(data) is dict:
+            collect_sources(data.get('data'), sources)
+    if not sources:
+        return {}
+    return {
+        source_repo_object_id: (title, showroom_id)
+        for source_repo_object_id, title, showroom_id in (
+            ShowroomObject.active_objects.filter(
+                source_repo_object_id__in=sources
+            ).values_list('source_repo_object_id', 'title', 'showroom_id')
         )
-        raise FieldTransformerMissingError(field)
+    }
+
+
+def collect_sources(data, sources):
+    if type(data) is dict:
+        if type(source := data.get('source')) is str:
+            sources.add(source)
+        for value in data.values():
+            collect_sources(value, sources)
+    elif type(data) is list:
+        for value in data:
+            collect_sources(value, sources)
+
+
+TRANSFORMED_FIELDS = ['primary_details', 'secondary_details', 'list', 'locations']
+
+
+def retransform_activities(activities):
+    """Transform the display data of several activities again from their repo data.
+
+    This is used to update the display data after changes to the mapping or the
+    vocabulary. The referenced entities and the labels requested by the schemas'
+    transformations are loaded for all activities at once. Every activity is only
+    written, if it was not synced again since it was read, so newer repo data is
+    never overwritten with display data of the old one. Returns the number of
+    updated activities.
+    """
+    entities = resolve_entities([activity.source_repo_data for activity in activities])
+    schemas = []
+    for activity in activities:
+        activity_type = activity.activitydetail.activity_type or {}
+        schema = get_schema(activity_type.get('source'))
+        schemas.append('__none__' if schema is None else schema)
+    prefetch_labels(
+        set().union(*(plan_concepts.get(schema, ()) for schema in set(schemas)))
+    )
+
+    updated = 0
+    with transaction.atomic():
+        for activity, schema in zip(activities, schemas):
+            try:
+                transformed = transform_data(
+                    activity.source_repo_data, schema, entities=entities
+                )
+            except (MappingNotFoundError, FieldTransformerMissingError) as e:
+                logger.error(f'Could not transform activity {activity.id}: {e!r}')
+                continue
+            updated += ShowroomObject.objects.filter(
+                id=activity.id,
+                date_synced=activity.date_synced,
+                content_hash=activity.content_hash,
+            ).update(
+                **{field: transformed.get(field) for field in TRANSFORMED_FIELDS},
+                cache_version=F('cache_version') + 1,
+            )
+    return updated
 
-    transformed = functions[field](data)
-    return transformed
+
+def retransform_activities_job(activity_ids):
+    activities = ShowroomObject.active_objects.filter(
+        id__in=activity_ids, type=ShowroomObject.ACTIVITY
+    ).select_related('activitydetail')
+    return retransform_activities(list(activities))
+
+
+def enqueue_retransform_jobs(activity_ids, chunk_size=200):
+    """Schedule the transformation of activities in chunks of chunk_size.
+
+    Every chunk is a separate job, so they can be processed in parallel by
+    several workers.
+    """
+    queue = get_queue('default')
+    for i in range(0, len(activity_ids), chunk_size):
+        queue.enqueue(retransform_activities_job, activity_ids[i : i + chunk_size])
 
 
 # According to the docs/api/api_v1_showroom.yml definition in the showroom-frontend repo
@@ -1753,16 +1793,199 @@ def list_published_in(data):
 
 def transform_entity(entity):
     if source_repo_object_id := entity.get('source'):
-        try:
-            e = ShowroomObject.active_objects.get(
-                source_repo_object_id=source_repo_object_id
-            )
-            ret = {'value': e.title}
-            if e.active:
-                ret['source'] = e.showroom_id
-            return ret
-        except ShowroomObject.DoesNotExist:
-            pass
+        if (entities := resolved_entities.get()) is None:
+            entities = resolve_entities([{'data': entity}])
+        if source_repo_object_id in entities:
+            title, showroom_id = entities[source_repo_object_id]
+            return {'value': title, 'source': showroom_id}
     return {
         'value': entity['label'],
     }
+
+
+field_transformers = {
+    'architecture': get_architecture,
+    'artists': get_artists,
+    'authors': get_authors,
+    'award_ceremony_location_description': get_award_ceremony_location_description,
+    'award_date': get_award_date,
+    'category': get_category,
+    'combined_locations': get_combined_locations,
+    'composition': get_composition,
+    'commissions': get_commissions,
+    'conductors': get_conductors,
+    'contributors': get_contributors,
+    'curators': get_curators,
+    'date': get_date,
+    'date_location': get_date_location,
+    'date_location_description': get_date_location_description,
+    'date_opening_location': get_date_opening_location,
+    'date_range': get_date_range,
+    'date_range_location': get_date_range_location,
+    'date_range_time_range_location': get_date_range_time_range_location,
+    'date_time_range_location': get_date_time_range_location,
+    'design': get_design,
+    'dimensions': get_dimensions,
+    'directors': get_directors,
+    'documentation_url': get_documentation_url,
+    'duration': get_duration,
+    'editors': get_editors,
+    'fellow': get_fellow,
+    'format': get_format,
+    'funding': get_funding,
+    'funding_category': get_funding_category,
+    'git_url': get_git_url,
+    'granted_by': get_granted_by,
+    'headline': get_headline,
+    'isan': get_isan,
+    'isbn_doi': get_isbn_doi,
+    'jury': get_jury,
+    'keywords': get_keywords,
+    'language': get_language,
+    'language_format_material_edition': get_language_format_material_edition,
+    'lecturers': get_lecturers,
+    'list_contributors': list_contributors,
+    'list_published_in': list_published_in,
+    'material': get_material,
+    'material_format': get_material_format,
+    'material_format_dimensions': get_material_format_dimensions,
+    'music': get_music,
+    'open_source_license': get_open_source_license,
+    'opening': get_opening,
+    'organisations': get_organisations,
+    'organisers': get_organisers,
+    'programming_language': get_programming_language,
+    'project_lead': get_project_lead,
+    'project_partners': get_project_partners,
+    'published_in': get_published_in,
+    'publisher_place_date': get_publisher_place_date,
+    'software_developers': get_software_developers,
+    'software_version': get_software_version,
+    'status': get_status,
+    'texts_with_types': get_texts_with_types,
+    'title_of_event': get_title_of_event,
+    'type': get_type,
+    'url': get_url,
+    'volume_issue_pages': get_volume_issue_pages,
+    'winners': get_winners,
+}
+
+# the concepts, whose labels the transformation functions request from the
+# vocabulary. fields not listed here do not request any labels. keep this in sync
+# with the get_preflabel and get_altlabel calls of the transformation functions
+field_label_concepts = {
+    'architecture': ('architecture',),
+    'artists': ('artist',),
+    'authors': ('author',),
+    'award_ceremony_location_description': ('award_ceremony',),
+    'award_date': ('date',),
+    'category': ('category',),
+    'composition': ('composition',),
+    'commissions': ('commissions_orders_for_works',),
+    'conductors': ('conductor',),
+    'contributors': ('contributor',),
+    'curators': ('curator',),
+    'date': ('date',),
+    'date_location': ('date', 'location'),
+    'date_location_description': ('date', 'location'),
+    'date_opening_location': ('date', 'location'),
+    'date_range': ('duration',),
+    'date_range_location': ('date',),
+    'date_range_time_range_location': ('date',),
+    'date_time_range_location': ('date', 'location'),
+    'design': ('design',),
+    'dimensions': ('dimensions',),
+    'directors': ('director',),
+    'documentation_url': ('documentation_url',),
+    'duration': ('duration',),
+    'editors': ('editor',),
+    'fellow': ('fellow_scholar',),
+    'format': ('format',),
+    'funding': ('funding',),
+    'funding_category': ('funding_category',),
+    'git_url': ('git_url',),
+    'granted_by': ('granted_by',),
+    'isan': ('isan',),
+    'isbn_doi': ('isbn', 'doi'),
+    'jury': ('jury',),
+    'keywords': ('keywords',),
+    'language': ('language',),
+    'language_format_material_edition': ('language', 'format', 'material', 'edition'),
+    'lecturers': ('lecturer',),
+    'list_contributors': ('contributor',),
+    'list_published_in': ('published_in',),
+    'material': ('material',),
+    'material_format': ('material', 'format'),
+    'material_format_dimensions': ('material', 'format'),
+    'music': ('music',),
+    'open_source_license': ('open_source_license',),
+    'opening': ('opening',),
+    'organisations': ('organisation',),
+    'organisers': ('organiser_management',),
+    'programming_language': ('programming_language',),
+    'project_lead': ('project_lead',),
+    'project_partners': ('project_partnership',),
+    'published_in': ('published_in',),
+    'publisher_place_date': ('publisher', 'location', 'date'),
+    'software_developers': ('software_developer',),
+    'software_version': ('software_version',),
+    'status': ('status',),
+    'texts_with_types': ('text',),
+    'title_of_event': ('title_of_event',),
+    'type': ('type',),
+    'volume_issue_pages': ('volume_issue', 'pages'),
+    'winners': ('winner',),
+}
+
+# fields of each schema for which no transformation function is available
+missing_transformers = {}
+
+
+def compile_transform_plans():
+    """Resolve the transformation functions for all schemas in the mapping.
+
+    Returns a dict of schema to a tuple of (category, transformers)
+    pairs, so transform_data does not have to look up the functions
+    for every field of every activity. Fields for which no function is
+    available are logged and collected in missing_transformers.
+    """
+    plans = {}
+    for schema, categories in mapping.items():
+        plan = []
+        for category, fields in categories.items():
+            transformers = []
+            for field in fields:
+                if transformer := field_transformers.get(field):
+                    transformers.append(transformer)
+                else:
+                    logger.error(
+                        f'No transformation function is available for field {field!r}'
+                        + f' in schema {schema!r}'
+                    )
+                    missing_transformers.setdefault(schema, []).append(field)
+            plan.append((category, tuple(transformers)))
+        plans[schema] = tuple(plan)
+    return plans
+
+
+transform_plans = compile_transform_plans()
+
+
+def compile_plan_concepts():
+    """Collect the concepts, whose labels the transformations of each schema request.
+
+    Returns a dict of schema to a frozenset of concepts, so the labels can be
+    prefetched before several activities are transformed.
+    """
+    return {
+        schema: frozenset(
+            concept
+            for fields in categories.values()
+            for field in fields
+            for concept in field_label_concepts.get(field, ())
+        )
+        for schema, categories in mapping.items()
+    }
+
+
+plan_concepts = compile_plan_concepts()
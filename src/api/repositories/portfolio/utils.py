@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import hashlib
+import json
 from datetime import datetime
 
 from django.conf import settings
 
-from api.repositories.portfolio import get_preflabel
+from api.repositories.portfolio import get_preflabel, get_schema, get_vocabulary_version
+from api.repositories.portfolio.mapping import get_mapping_version
 
 role_fields = [
     'architecture',
@@ -141,3 +144,26 @@ def years_list_from_date_range(dr) -> list[str]:
     elif dr.get('date_to'):
         years.append(year_from_date_string(dr['date_to']))
     return years
+
+
+def get_content_hash(data):
+    """Return a stable hash of the content of a pushed activity.
+
+    The hash covers the repo data and owner of the activity, as well as
+    the schema it is mapped to, the current mapping version and the version
+    of the loaded vocabulary snapshot. So if the hash of a republished
+    activity did not change, transforming it again would lead to the same
+    result.
+    """
+    repo_data = data.get('data')
+    entry_type = repo_data.get('type') if type(repo_data) is dict else None
+    schema = get_schema(entry_type.get('source')) if type(entry_type) is dict else None
+    content = {
+        'data': repo_data,
+        'owner': data.get('source_repo_owner_id'),
+        'schema': schema,
+        'mapping_version': get_mapping_version(),
+        'vocabulary_version': get_vocabulary_version(),
+    }
+    content = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
@@ -6,10 +6,14 @@ from api.repositories.portfolio import (
     MappingNotFoundError,
     transform,
 )
+from api.repositories.portfolio.utils import get_content_hash
 from core.models import ShowroomObject
 from general.datetime.utils import format_datetime
 
-from ..repositories.portfolio.search import get_search_item
+from ..repositories.portfolio.search import (
+    SEARCH_ITEM_DEFERRED_FIELDS,
+    get_search_items,
+)
 from . import logger, showroom_object_fields
 from .generic import localise_detail_fields
 from .media import MediaSerializer
@@ -28,6 +32,16 @@ class ActivitySerializer(serializers.ModelSerializer):
         # disable unique together checks
         return []
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # for batch publishing the source repositories and owning entities are
+        # resolved upfront and passed in the context, so they are set in
+        # to_internal_value instead of being looked up for every item
+        if self.context.get('source_repos') is not None:
+            fields['source_repo'].read_only = True
+            fields['belongs_to'].read_only = True
+        return fields
+
     def to_internal_value(self, data):
         new_data = {
             'source_repo_object_id': data.get('source_repo_entry_id'),
@@ -49,12 +63,17 @@ class ActivitySerializer(serializers.ModelSerializer):
         new_data['subtext'] = [subtext] if subtext else []
         new_data['type'] = ShowroomObject.ACTIVITY
 
-        try:
-            new_data['belongs_to'] = ShowroomObject.active_objects.get(
-                source_repo_object_id=data.get('source_repo_owner_id')
-            ).id
-        except ShowroomObject.DoesNotExist:
-            new_data['belongs_to'] = None
+        # for batch publishing the owning entities are resolved upfront and passed
+        # in the context as a dict of source_repo_object_id to showroom object id
+        if (owners := self.context.get('owners')) is not None:
+            new_data['belongs_to'] = owners.get(data.get('source_repo_owner_id'))
+        else:
+            try:
+                new_data['belongs_to'] = ShowroomObject.active_objects.get(
+                    source_repo_object_id=data.get('source_repo_owner_id')
+                ).id
+            except ShowroomObject.DoesNotExist:
+                new_data['belongs_to'] = None
         new_data['source_repo_data'] = repo_data
 
         # now fetch the schema and apply transformations for optimised display data
@@ -63,7 +82,9 @@ class ActivitySerializer(serializers.ModelSerializer):
         else:
             schema = '__none__'
         try:
-            transformed = transform.transform_data(repo_data, schema)
+            transformed = transform.transform_data(
+                repo_data, schema, entities=self.context.get('entities')
+            )
         except MappingNotFoundError as e:
             # TODO: check why we the 500 response code is ignored and turned into a 400
             raise serializers.ValidationError(
@@ -90,7 +111,21 @@ class ActivitySerializer(serializers.ModelSerializer):
                 code=500,
             ) from e
         new_data.update(transformed)
-        return super().to_internal_value(new_data)
+        validated_data = super().to_internal_value(new_data)
+        if (source_repos := self.context.get('source_repos')) is not None:
+            source_repo = source_repos.get(str(data.get('source_repo')))
+            if source_repo is None:
+                raise serializers.ValidationError(
+                    {
+                        'source_repo': [
+                            f'Invalid pk {data.get("source_repo")!r} - object does not exist.'
+                        ]
+                    }
+                )
+            validated_data['source_repo'] = source_repo
+            validated_data['belongs_to_id'] = new_data['belongs_to']
+        validated_data['content_hash'] = get_content_hash(data)
+        return validated_data
 
     def to_representation(self, instance):
         ret = super().to_representation(instance)
@@ -175,16 +210,18 @@ class ActivitySerializer(serializers.ModelSerializer):
 
     def serialize_related(self):
         lang = self.context['request'].LANGUAGE_CODE
-        data = {
-            'to': [],
-            'from': [],
-        }
         # filter out entities
-        for relation in self.instance.relations_to.filter(type=self.instance.ACTIVITY):
-            data['to'].append(get_search_item(relation, lang))
-        for relation in self.instance.relations_from.filter(
-            type=self.instance.ACTIVITY
-        ):
-            data['from'].append(get_search_item(relation, lang))
-
-        return data
+        return {
+            'to': get_search_items(
+                self.instance.relations_to.filter(type=self.instance.ACTIVITY).defer(
+                    *SEARCH_ITEM_DEFERRED_FIELDS
+                ),
+                lang,
+            ),
+            'from': get_search_items(
+                self.instance.relations_from.filter(type=self.instance.ACTIVITY).defer(
+                    *SEARCH_ITEM_DEFERRED_FIELDS
+                ),
+                lang,
+            ),
+        }
@@ -10,6 +10,9 @@ from api.serializers.search import (
 class InitialSearchResultSerializer(serializers.Serializer):
     label = serializers.CharField()
     total = serializers.IntegerField()
+    total_exact = serializers.BooleanField(
+        help_text='Whether the total is exact, or a capped or estimated count.',
+    )
     data = SearchItemSerializer(many=True)
     filters = SearchFilterSerializer(many=True)
 
@@ -22,6 +22,15 @@ class MediaSerializer(serializers.ModelSerializer):
             'source_repo_media_id',
         ]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # for batch uploads the activities are resolved upfront and passed in the
+        # context as a dict of source_repo_entry_id to activity, so the view sets
+        # the showroom_object itself
+        if self.context.get('activities') is not None:
+            fields['showroom_object'].read_only = True
+        return fields
+
     def to_internal_value(self, data):
         # if a new media is posted, we need to inject the repos base url
         # into all properties that represent links
@@ -35,11 +44,16 @@ class MediaSerializer(serializers.ModelSerializer):
                 )
             # activity also has to be set to an existing activity, so we can get
             # the repos base url
-            try:
-                activity = ShowroomObject.active_objects.get(
-                    source_repo_object_id=data.get('source_repo_entry_id')
-                )
-            except ShowroomObject.DoesNotExist as err:
+            if (activities := self.context.get('activities')) is not None:
+                activity = activities.get(data.get('source_repo_entry_id'))
+            else:
+                try:
+                    activity = ShowroomObject.active_objects.get(
+                        source_repo_object_id=data.get('source_repo_entry_id')
+                    )
+                except ShowroomObject.DoesNotExist:
+                    activity = None
+            if activity is None:
                 raise serializers.ValidationError(
                     {
                         'source_repo_entry_id': [
@@ -47,7 +61,7 @@ class MediaSerializer(serializers.ModelSerializer):
                             + ' activity by its original source repo\'s entry id.'
                         ]
                     }
-                ) from err
+                )
             repo_base = activity.source_repo.url_repository
             # now check for links and add the repo_base url
             data['file'] = repo_base + data['file']
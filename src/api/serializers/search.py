@@ -35,6 +35,17 @@ class SearchRequestSerializer(serializers.Serializer):
         required=False,
         help_text='Offset for the first item in the results set.',
     )
+    cursor = serializers.CharField(
+        required=False,
+        help_text='Cursor from the next property of a previous result, to fetch the'
+        + ' following page. If set, the offset is ignored and no total is counted.',
+    )
+    facets = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text='Add the number of results per keyword, activity type and'
+        + ' institution to the response.',
+    )
     order_by = serializers.ChoiceField(
         required=False,
         default='default',
@@ -74,8 +85,35 @@ class SearchItemSerializer(serializers.Serializer):
     score = serializers.IntegerField()
 
 
+class SearchFacetSerializer(serializers.Serializer):
+    id = serializers.JSONField(
+        help_text='Option id of the keyword, activity_type or institution filter'
+    )
+    count = serializers.IntegerField()
+
+
+class SearchFacetsSerializer(serializers.Serializer):
+    keyword = SearchFacetSerializer(many=True)
+    activity_type = SearchFacetSerializer(many=True)
+    institution = SearchFacetSerializer(many=True)
+
+
 # TODO: add some examples to the schema
 class SearchResultSerializer(serializers.Serializer):
     label = serializers.CharField()
-    total = serializers.IntegerField()
+    total = serializers.IntegerField(
+        allow_null=True,
+        help_text='Total number of results. Not counted, if a cursor was provided.',
+    )
+    total_exact = serializers.BooleanField(
+        help_text='Whether the total is exact, or a capped or estimated count.',
+    )
     data = SearchItemSerializer(many=True)
+    next = serializers.CharField(
+        allow_null=True,
+        help_text='Cursor to fetch the next page, if there might be more results.',
+    )
+    facets = SearchFacetsSerializer(
+        required=False,
+        help_text='Number of results per filter option, if facets were requested.',
+    )
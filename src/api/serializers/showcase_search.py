@@ -29,3 +29,7 @@ class ShowcaseSearchSerializer(serializers.Serializer):
     offset = serializers.IntegerField(
         required=False, help_text='Offset for the first item in the results set.'
     )
+    cursor = serializers.CharField(
+        required=False,
+        help_text='Cursor from the next property of a previous result, to fetch the following page. If set, the offset is ignored and no total is counted.',
+    )
@@ -1,3 +1,93 @@
-# from django.test import TestCase
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from api.repositories.portfolio.search import (
+    SEARCH_ITEM_DEFERRED_FIELDS,
+    get_search_items,
+)
+from api.repositories.portfolio.search_indexer import (
+    index_activities,
+    update_search_documents,
+)
+from core.models import ShowroomObject, SourceRepository, TextSearchIndex
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+)
+class SearchItemQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        source_repo = SourceRepository.objects.create(
+            id=1,
+            label_institution='Test University',
+            label_repository='Test Repository',
+            url_institution='https://example.org',
+            url_repository='https://example.org/repository',
+            api_key='test',
+        )
+        for i in range(20):
+            ShowroomObject.objects.create(
+                title=f'Activity {i}',
+                type=ShowroomObject.ACTIVITY,
+                source_repo=source_repo,
+                source_repo_object_id=f'activity-{i}',
+                source_repo_data={'data': {}},
+            )
+
+    def count_queries(self, limit):
+        items = list(
+            ShowroomObject.objects.defer(*SEARCH_ITEM_DEFERRED_FIELDS).order_by('id')[
+                :limit
+            ]
+        )
+        with CaptureQueriesContext(connection) as context:
+            results = get_search_items(items, 'en')
+        self.assertEqual(len(results), limit)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.assertEqual(self.count_queries(1), self.count_queries(20))
+
+
+class SearchDocumentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        source_repo = SourceRepository.objects.create(
+            id=1,
+            label_institution='Test University',
+            label_repository='Test Repository',
+            url_institution='https://example.org',
+            url_repository='https://example.org/repository',
+            api_key='test',
+        )
+        cls.activity = ShowroomObject.objects.create(
+            title='Painting in Vienna',
+            type=ShowroomObject.ACTIVITY,
+            source_repo=source_repo,
+            source_repo_object_id='activity',
+            source_repo_data={'title': 'Painting in Vienna', 'data': {}},
+        )
+
+    def test_only_changed_search_documents_are_written(self):
+        objects = ShowroomObject.objects.filter(id=self.activity.id)
+        self.assertEqual(update_search_documents(objects), 1)
+        self.assertEqual(update_search_documents(objects), 0)
+        objects.update(title='Sculpture in Vienna')
+        self.assertEqual(update_search_documents(objects), 1)
+
+    def test_index_activities(self):
+        index_activities([self.activity])
+        index_activities([self.activity])
+        self.assertEqual(
+            TextSearchIndex.objects.filter(showroom_object=self.activity).count(),
+            len(settings.LANGUAGES),
+        )
+        self.activity.refresh_from_db()
+        for lang, _lang_label in settings.LANGUAGES:
+            self.assertIn(
+                'vienna',
+                getattr(self.activity, ShowroomObject.search_document_field(lang)),
+            )
@@ -1,6 +1,7 @@
 import logging
 from datetime import datetime, timedelta
 
+import shortuuid
 from django_rq import get_queue
 from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import mixins, status, viewsets
@@ -11,16 +12,25 @@ from rq.exceptions import NoSuchJobError
 from rq.registry import ScheduledJobRegistry
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
 from django.db.utils import IntegrityError
 from django.utils import timezone
 
 from api.permissions import ApiKeyPermission
-from api.repositories.portfolio.search_indexer import index_activity
-from api.repositories.portfolio.utils import get_usernames_from_roles
+from api.repositories.portfolio.search_indexer import enqueue_index_job
+from api.repositories.portfolio.transform import resolve_entities
+from api.repositories.portfolio.utils import get_content_hash, get_usernames_from_roles
 from api.repositories.user_preferences.sync import pull_user_data
 from api.serializers.activity import ActivityRelationSerializer, ActivitySerializer
 from api.serializers.generic import Responses
-from core.models import ContributorActivityRelations, ShowroomObject
+from core.models import (
+    ActivityDetail,
+    ContributorActivityRelations,
+    Relation,
+    ShowroomObject,
+    SourceRepository,
+)
 
 publishing_log = logging.getLogger('publishing_log')
 logger = logging.getLogger(__name__)
@@ -58,6 +68,26 @@ class ActivityViewSet(
         },
     )
     def create(self, request, *args, **kwargs):
+        # if an activity is republished without changes, we only update its sync date
+        if unchanged := get_unchanged_activities([request.data]):
+            (showroom_id,) = unchanged.values()
+            update_unchanged_activities([showroom_id], timezone.now())
+            pub_user = request.data.get('source_repo_owner_id')
+            publishing_log.info(f'{showroom_id} republished unchanged by {pub_user}')
+            return Response(
+                {
+                    'created': [],
+                    'updated': [
+                        {
+                            'id': request.data.get('source_repo_entry_id'),
+                            'showroom_id': showroom_id,
+                        }
+                    ],
+                    'errors': [],
+                },
+                status=status.HTTP_201_CREATED,
+            )
+
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         already_published = False
@@ -92,14 +122,7 @@ class ActivityViewSet(
         # now fill the ActivityDetail belonging to this ShowroomObject
         repo_data = serializer.instance.source_repo_data
         serializer.instance.activitydetail.activity_type = repo_data.get('type')
-        serializer.instance.activitydetail.keywords = (
-            {
-                kw['label'][settings.LANGUAGE_CODE]: True
-                for kw in repo_data.get('keywords')
-            }
-            if repo_data.get('keywords')
-            else {}
-        )
+        serializer.instance.activitydetail.keywords = get_keywords(repo_data)
         serializer.instance.activitydetail.save()
 
         # (re)generate the contributor relations to this activity
@@ -119,50 +142,13 @@ class ActivityViewSet(
             relations, ignore_conflicts=True
         )
 
-        # as soon as the serializer is saved we want the full text search index to be
-        # built. TODO: refactor this to an async worker
-        index_activity(serializer.instance)
-
-        if not settings.DISABLE_USER_REPO:
-            if serializer.instance.belongs_to:
-                # in case the entity is already in the system, we'll sync it from UP
-                # if the current version is older than the configured sync time
-                serializer.instance.belongs_to.entitydetail.enqueue_list_render_job()
-                t_synced = serializer.instance.belongs_to.date_synced
-                t_cache = datetime.today() - timedelta(
-                    minutes=settings.USER_REPO_CACHE_TIME
-                )
-                if t_synced is None or t_synced.timestamp() < t_cache.timestamp():
-                    queue = get_queue('default')
-                    queue.enqueue(
-                        pull_user_data,
-                        username=serializer.instance.source_repo_owner_id,
-                    )
+        # as soon as the serializer is saved we want the search indices to be built,
+        # which is done by a worker to not delay the response
+        enqueue_index_job(serializer.instance.id)
 
-            else:
-                # in case the entity is not in the system yet, we fetch it from UP,
-                # but with a small delay, so in case many activities are pushed at
-                # once, the sync job for the entity is only executed after the last
-                # activity was pushed
-                job_id = f'entity_sync_{serializer.instance.source_repo_owner_id}'
-                queue = get_queue('default')
-                registry = ScheduledJobRegistry(queue=queue)
-                if job_id in registry:
-                    try:
-                        registry.remove(job_id, delete_job=True)
-                    except NoSuchJobError:
-                        pass
-                queue.enqueue_in(
-                    timedelta(seconds=settings.WORKER_DELAY_ENTITY),
-                    pull_user_data,
-                    username=serializer.instance.source_repo_owner_id,
-                    job_id=job_id,
-                )
-        # in case the user repo is turned off, we nevertheless want to check, if there
-        # is already an entity in the system, for which we can generate a new list
-        else:
-            if serializer.instance.belongs_to:
-                serializer.instance.belongs_to.entitydetail.enqueue_list_render_job()
+        enqueue_entity_jobs(
+            serializer.instance.belongs_to, serializer.instance.source_repo_owner_id
+        )
 
         response = {
             'created': [],
@@ -186,6 +172,236 @@ class ActivityViewSet(
 
         return Response(response, status=status.HTTP_201_CREATED)
 
+    @extend_schema(
+        tags=['repo'],
+        request=ActivitySerializer(many=True),
+        responses={
+            201: ActivitySerializer(many=True),
+            400: Responses.Error400,
+            403: Responses.Error403,
+        },
+    )
+    @action(detail=False, methods=['post'])
+    def batch(self, request, *args, **kwargs):
+        """Publish a list of activities at once.
+
+        Every item has the same format as for a single activity. Items
+        that cannot be validated are reported in the errors list of the
+        response, all others are created or updated with bulk queries.
+        """
+        if type(request.data) is not list:
+            return Response(
+                {'detail': 'Has to be a list of activities'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        response = {
+            'created': [],
+            'updated': [],
+            'errors': [],
+        }
+
+        # resolve all owning entities at once, instead of one lookup per activity
+        owner_ids = {
+            item.get('source_repo_owner_id')
+            for item in request.data
+            if type(item) is dict
+        }
+        context = self.get_serializer_context()
+        context['owners'] = dict(
+            ShowroomObject.active_objects.filter(
+                source_repo_object_id__in=owner_ids
+            ).values_list('source_repo_object_id', 'id')
+        )
+        # the same goes for the source repositories and the entities referenced in
+        # the data of all activities
+        repo_ids = set()
+        for item in request.data:
+            if type(item) is dict:
+                try:
+                    repo_ids.add(int(item.get('source_repo')))
+                except (TypeError, ValueError):
+                    pass
+        context['source_repos'] = {
+            str(repo.id): repo
+            for repo in SourceRepository.objects.filter(id__in=repo_ids)
+        }
+        context['entities'] = resolve_entities(
+            [item.get('data') for item in request.data if type(item) is dict]
+        )
+
+        # activities that are republished without changes only need a sync date update
+        now = timezone.now()
+        unchanged = get_unchanged_activities(request.data)
+        if unchanged:
+            update_unchanged_activities(unchanged.values(), now)
+
+        # validate and transform all items. if an activity is contained more than
+        # once, only the last one will be used
+        validated = {}
+        for item in request.data:
+            if type(item) is not dict:
+                response['errors'].append(
+                    {'id': None, 'errors': ['Invalid type - has to be an object']}
+                )
+                continue
+            key = (str(item.get('source_repo')), item.get('source_repo_entry_id'))
+            if key in unchanged:
+                continue
+            serializer = ActivitySerializer(data=item, context=context)
+            if not serializer.is_valid():
+                response['errors'].append(
+                    {
+                        'id': item.get('source_repo_entry_id'),
+                        'errors': serializer.errors,
+                    }
+                )
+                continue
+            data = serializer.validated_data
+            validated[(data['source_repo'].id, data['source_repo_object_id'])] = data
+
+        pub_users = {
+            (str(item.get('source_repo')), item.get('source_repo_entry_id')): item.get(
+                'source_repo_owner_id'
+            )
+            for item in request.data
+            if type(item) is dict
+        }
+        for key, showroom_id in unchanged.items():
+            response['updated'].append({'id': key[1], 'showroom_id': showroom_id})
+            publishing_log.info(
+                f'{showroom_id} republished unchanged by {pub_users.get(key)}'
+            )
+
+        if not validated:
+            return Response(response, status=status.HTTP_201_CREATED)
+
+        # fetch all activities that already exist in a single query
+        repo_object_ids = {}
+        for repo_id, object_id in validated:
+            repo_object_ids.setdefault(repo_id, []).append(object_id)
+        q_existing = Q()
+        for repo_id, object_ids in repo_object_ids.items():
+            q_existing |= Q(
+                source_repo_id=repo_id, source_repo_object_id__in=object_ids
+            )
+        existing = {
+            (obj.source_repo_id, obj.source_repo_object_id): obj
+            for obj in ShowroomObject.objects.filter(q_existing).only(
+                'id', 'source_repo_id', 'source_repo_object_id', 'active'
+            )
+        }
+
+        created = []
+        updated = []
+        for key, data in validated.items():
+            if (instance := existing.get(key)) is None:
+                instance = ShowroomObject(id=shortuuid.uuid())
+                instance.showroom_id = instance.id
+                created.append(instance)
+                already_published = False
+            else:
+                updated.append(instance)
+                already_published = instance.active
+            for field, value in data.items():
+                setattr(instance, field, value)
+            instance.date_synced = now
+            instance.date_changed = now
+            instance.active = True
+            instance.autocomplete_text = instance.get_autocomplete_text()
+
+            item = {'id': key[1], 'showroom_id': instance.id}
+            if already_published:
+                response['updated'].append(item)
+            else:
+                response['created'].append(item)
+
+        activities = created + updated
+        with transaction.atomic():
+            ShowroomObject.objects.bulk_create(created)
+            ShowroomObject.objects.bulk_update(
+                updated,
+                [
+                    'title',
+                    'subtext',
+                    'type',
+                    'list',
+                    'primary_details',
+                    'secondary_details',
+                    'locations',
+                    'source_repo_owner_id',
+                    'source_repo_data',
+                    'belongs_to',
+                    'date_synced',
+                    'date_changed',
+                    'active',
+                    'content_hash',
+                    'autocomplete_text',
+                ],
+            )
+            ShowroomObject.bump_cache_versions([instance.id for instance in updated])
+
+            # now fill the ActivityDetails belonging to those ShowroomObjects. as
+            # bulk_create does not send post_save signals, we create them here
+            details = {
+                instance.id: ActivityDetail(
+                    showroom_object=instance,
+                    activity_type=instance.source_repo_data.get('type'),
+                    keywords=get_keywords(instance.source_repo_data),
+                )
+                for instance in activities
+            }
+            ActivityDetail.objects.bulk_create(
+                [details[instance.id] for instance in created]
+            )
+            ActivityDetail.objects.bulk_update(
+                [details[instance.id] for instance in updated],
+                ['activity_type', 'keywords'],
+            )
+
+            # (re)generate the contributor relations to all activities
+            contributor_names = {
+                instance.id: get_usernames_from_roles(instance)
+                for instance in activities
+            }
+            q_outdated = Q()
+            for activity_id, names in contributor_names.items():
+                q_outdated |= Q(activity_id=activity_id) & ~Q(
+                    contributor_source_id__in=names
+                )
+            ContributorActivityRelations.objects.filter(q_outdated).delete()
+            ContributorActivityRelations.objects.bulk_create(
+                [
+                    ContributorActivityRelations(
+                        contributor_source_id=contributor,
+                        activity_id=activity_id,
+                    )
+                    for activity_id, names in contributor_names.items()
+                    for contributor in names
+                ],
+                ignore_conflicts=True,
+            )
+
+        for instance in activities:
+            enqueue_index_job(instance.id)
+
+        # log the publication activities in our separate publishing.log
+        updated_ids = {item['showroom_id'] for item in response['updated']}
+        for instance in activities:
+            pub_user = instance.source_repo_owner_id
+            if instance.id in updated_ids:
+                publishing_log.info(f'{instance.id} updated by {pub_user}')
+            else:
+                publishing_log.info(f'{instance.id} published by {pub_user}')
+
+        # entity jobs are only needed once per owner, not once per activity
+        owners = {}
+        for instance in activities:
+            owners[instance.source_repo_owner_id] = instance.belongs_to
+        for owner_id, entity in owners.items():
+            enqueue_entity_jobs(entity, owner_id)
+
+        return Response(response, status=status.HTTP_201_CREATED)
+
     @extend_schema(
         tags=['repo'],
         parameters=[
@@ -267,35 +483,52 @@ class ActivityViewSet(
                     {'related_to': 'Must only contain strings'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-        # Now clear all existing relations and add the new ones
-        activity.relations_to.clear()
-        relations_added = []
-        relations_not_added = []
+        # resolve all related activities at once and only apply the difference to
+        # the existing relations
+        related_ids = dict(
+            ShowroomObject.active_objects.filter(
+                source_repo_object_id__in=related_to,
+                source_repo_id=request.META.get('HTTP_X_API_CLIENT'),
+            ).values_list('source_repo_object_id', 'id')
+        )
+        relations_added = [related for related in related_to if related in related_ids]
+        relations_not_added = [
+            related for related in related_to if related not in related_ids
+        ]
         relations_error = []
-        for related in related_to:
-            try:
-                related_activity = ShowroomObject.active_objects.get(
-                    source_repo_object_id=related,
-                    source_repo_id=request.META.get('HTTP_X_API_CLIENT'),
+        target_ids = set(related_ids.values())
+        existing_ids = set(
+            Relation.objects.filter(from_object=activity).values_list(
+                'to_object_id', flat=True
+            )
+        )
+        try:
+            with transaction.atomic():
+                Relation.objects.filter(from_object=activity).exclude(
+                    to_object_id__in=target_ids
+                ).delete()
+                Relation.objects.bulk_create(
+                    [
+                        Relation(from_object=activity, to_object_id=to_id)
+                        for to_id in target_ids - existing_ids
+                    ],
+                    ignore_conflicts=True,
                 )
-                activity.relations_to.add(related_activity)
-                relations_added.append(related)
-            except ShowroomObject.DoesNotExist:
-                relations_not_added.append(related)
-            except IntegrityError as err:
-                # TODO: this case should not happen, as the RelatedManager should handle this
-                #   gracefully. But we ran into some rare edge cases where this did occur (maybe a
-                #   postgres issue?)
-                #   added this exception on 2024-01-08
-                #   check the logs for these errors in the next year and discuss how to proceed
-                relations_error.append(related)
-                error_msg = f'Could not add relation due to IntegrityError: {err}'
-                info = f'Current relations of activity {activity} are: {activity.relations_to.all()}'
-                if error_msg[-1] == '\n':
-                    error_msg += info
-                else:
-                    error_msg += f'\n{info}'
-                logger.error(error_msg)
+        except IntegrityError as err:
+            # TODO: this case should not happen, as conflicting relations are ignored.
+            #   But we ran into some rare edge cases where this did occur (maybe a
+            #   postgres issue?)
+            #   added this exception on 2024-01-08
+            #   check the logs for these errors in the next year and discuss how to proceed
+            relations_error = relations_added
+            relations_added = []
+            error_msg = f'Could not update relations due to IntegrityError: {err}'
+            info = f'Current relations of activity {activity} are: {activity.relations_to.all()}'
+            if error_msg[-1] == '\n':
+                error_msg += info
+            else:
+                error_msg += f'\n{info}'
+            logger.error(error_msg)
 
         publishing_info = f'Relations for {activity.id} updated: {relations_added}'
         added_info = ''
@@ -312,3 +545,95 @@ class ActivityViewSet(
             'error': relations_error,
         }
         return Response(ret, status=status.HTTP_201_CREATED)
+
+
+def get_keywords(repo_data):
+    if not repo_data.get('keywords'):
+        return {}
+    return {kw['label'][settings.LANGUAGE_CODE]: True for kw in repo_data['keywords']}
+
+
+def get_unchanged_activities(items):
+    """Find activities that are republished without any changes.
+
+    Returns a dict of (source_repo, source_repo_object_id) tuples to
+    showroom ids, for all pushed items whose content hash matches the
+    one of the already published activity.
+    """
+    hashes = {}
+    for item in items:
+        if type(item) is dict:
+            key = (str(item.get('source_repo')), item.get('source_repo_entry_id'))
+            hashes[key] = get_content_hash(item)
+    if not hashes:
+        return {}
+    published = ShowroomObject.active_objects.filter(
+        type=ShowroomObject.ACTIVITY,
+        source_repo_object_id__in=[object_id for _repo_id, object_id in hashes],
+        content_hash__isnull=False,
+    ).values_list('id', 'source_repo_id', 'source_repo_object_id', 'content_hash')
+    return {
+        (str(repo_id), object_id): showroom_id
+        for showroom_id, repo_id, object_id, content_hash in published
+        if hashes.get((str(repo_id), object_id)) == content_hash
+    }
+
+
+def update_unchanged_activities(showroom_ids, now):
+    """Update the sync date of activities that are republished without changes.
+
+    As their search indices are still up to date, they are also marked as
+    indexed, unless the indexing of an earlier change is still pending.
+    """
+    ShowroomObject.objects.filter(id__in=showroom_ids).update(
+        date_synced=now,
+        date_indexed=Case(
+            When(date_indexed__gte=F('date_synced'), then=Value(now)),
+            When(date_indexed__isnull=False, date_synced__isnull=True, then=Value(now)),
+            default=F('date_indexed'),
+        ),
+    )
+
+
+def enqueue_entity_jobs(entity, owner_id):
+    """Schedule list rendering and user repo syncs for an activity's owner."""
+    if not settings.DISABLE_USER_REPO:
+        if entity:
+            # in case the entity is already in the system, we'll sync it from UP
+            # if the current version is older than the configured sync time
+            entity.entitydetail.enqueue_list_render_job()
+            t_synced = entity.date_synced
+            t_cache = datetime.today() - timedelta(
+                minutes=settings.USER_REPO_CACHE_TIME
+            )
+            if t_synced is None or t_synced.timestamp() < t_cache.timestamp():
+                queue = get_queue('default')
+                queue.enqueue(
+                    pull_user_data,
+                    username=owner_id,
+                )
+
+        else:
+            # in case the entity is not in the system yet, we fetch it from UP,
+            # but with a small delay, so in case many activities are pushed at
+            # once, the sync job for the entity is only executed after the last
+            # activity was pushed
+            job_id = f'entity_sync_{owner_id}'
+            queue = get_queue('default')
+            registry = ScheduledJobRegistry(queue=queue)
+            if job_id in registry:
+                try:
+                    registry.remove(job_id, delete_job=True)
+                except NoSuchJobError:
+                    pass
+            queue.enqueue_in(
+                timedelta(seconds=settings.WORKER_DELAY_ENTITY),
+                pull_user_data,
+                username=owner_id,
+                job_id=job_id,
+            )
+    # in case the user repo is turned off, we nevertheless want to check, if there
+    # is already an entity in the system, for which we can generate a new list
+    else:
+        if entity:
+            entity.entitydetail.enqueue_list_render_job()
@@ -2,7 +2,8 @@ from drf_spectacular.utils import OpenApiResponse, extend_schema
 from rest_framework import mixins, serializers, viewsets
 from rest_framework.response import Response
 
-from django.db.models import Q
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, IntegerField, Q, Value, When
 
 from api.serializers.autocomplete import (
     AutocompleteRequestSerializer,
@@ -10,6 +11,11 @@ from api.serializers.autocomplete import (
 )
 from api.views.filter import get_static_filter_label
 from core.models import ShowroomObject
+from general.utils import normalize_text
+
+# the trigram index can only be used for search strings of at least three characters,
+# shorter strings are only matched as prefixes
+TRIGRAM_MIN_LENGTH = 3
 
 
 class AutocompleteViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
@@ -65,10 +71,28 @@ class AutocompleteViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
 
         items_activity = []
         items_person = []
+        q = normalize_text(q)
         objects = base_queryset.filter(
-            title__icontains=q,
             type__in=[ShowroomObject.ACTIVITY, ShowroomObject.PERSON],
         )
+        if len(q) < TRIGRAM_MIN_LENGTH:
+            objects = objects.filter(autocomplete_text__startswith=q).order_by(
+                'autocomplete_text'
+            )
+        else:
+            # objects starting with the search string are ranked first
+            objects = (
+                objects.filter(autocomplete_text__contains=q)
+                .annotate(
+                    prefix_match=Case(
+                        When(autocomplete_text__startswith=q, then=Value(1)),
+                        default=Value(0),
+                        output_field=IntegerField(),
+                    ),
+                    similarity=TrigramSimilarity('autocomplete_text', q),
+                )
+                .order_by('-prefix_match', '-similarity', 'autocomplete_text')
+            )
         if q_filter:
             objects = objects.filter(q_filter)
         if limit:
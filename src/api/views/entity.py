@@ -399,6 +399,8 @@ class EntityViewSet(viewsets.GenericViewSet):
         limit = s.data.get('limit')
         offset = s.data.get('offset')
         order_by = s.validated_data.get('order_by')
+        cursor = s.validated_data.get('cursor')
+        facets = s.validated_data.get('facets')
         lang = request.LANGUAGE_CODE
 
         # entity search allows for a reduced filter set, so we check this before calling
@@ -421,7 +423,16 @@ class EntityViewSet(viewsets.GenericViewSet):
         queryset = ShowroomObject.active_objects.filter(belongs_to=instance)
 
         return Response(
-            get_search_results(queryset, filters, limit, offset, order_by, lang),
+            get_search_results(
+                queryset,
+                filters,
+                limit,
+                offset,
+                order_by,
+                lang,
+                cursor=cursor,
+                facets=facets,
+            ),
             status=200,
         )
 
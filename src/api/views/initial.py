@@ -124,12 +124,12 @@ def get_initial_response(request, showroom_id):
         source_repo__id=settings.DEFAULT_USER_REPO,
         type=ShowroomObject.ACTIVITY,
     )
-    count = qs.count()
     results = get_search_results(qs, [], limit, 0, 'currentness', lang)
     response['results'].append(
         {
             'label': label_current_activities[lang],
-            'total': count,
+            'total': results['total'],
+            'total_exact': results['total_exact'],
             'data': results['data'],
             'search': {
                 'order_by': 'currentness',
@@ -1,7 +1,11 @@
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from django.db import transaction
+from django.utils import timezone
+
 from api.permissions import ApiKeyPermission
 from api.serializers.generic import Responses
 from api.serializers.media import MediaSerializer
@@ -99,6 +103,153 @@ class MediaViewSet(
 
         return Response(response, status=status.HTTP_201_CREATED)
 
+    @extend_schema(
+        tags=['repo'],
+        request=MediaSerializer(many=True),
+        parameters=[
+            OpenApiParameter(
+                name='delete_missing',
+                type=bool,
+                default=False,
+                description='Delete all media of the submitted activities, which '
+                + 'are not contained in the request',
+            ),
+        ],
+        responses={
+            201: MediaSerializer(many=True),
+            400: Responses.Error400,
+            403: Responses.Error403,
+        },
+    )
+    @action(detail=False, methods=['post'])
+    def batch(self, request, *args, **kwargs):
+        """Create or update a list of media at once.
+
+        Every item has the same format as for a single medium, and the
+        media may belong to different activities. Items that cannot be
+        validated are reported in the errors list of the response.
+        """
+        if type(request.data) is not list:
+            return Response(
+                {'detail': 'Has to be a list of media'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        delete_missing = request.query_params.get('delete_missing') in ['true', '1']
+        response = {
+            'created': [],
+            'updated': [],
+            'deleted': [],
+            'errors': [],
+        }
+
+        # resolve all activities at once, instead of one lookup per medium
+        entry_ids = {
+            item.get('source_repo_entry_id')
+            for item in request.data
+            if type(item) is dict
+        }
+        context = self.get_serializer_context()
+        context['activities'] = {
+            activity.source_repo_object_id: activity
+            for activity in ShowroomObject.active_objects.filter(
+                source_repo_object_id__in=entry_ids
+            ).select_related('source_repo')
+        }
+
+        # validate all items. if a medium is contained more than once, only the last
+        # one will be used
+        validated = {}
+        for item in request.data:
+            if type(item) is not dict:
+                response['errors'].append(
+                    {'id': None, 'errors': ['Invalid type - has to be an object']}
+                )
+                continue
+            serializer = MediaSerializer(data=item, context=context)
+            if not serializer.is_valid():
+                response['errors'].append(
+                    {
+                        'id': item.get('source_repo_media_id'),
+                        'errors': serializer.errors,
+                    }
+                )
+                continue
+            activity = context['activities'][item['source_repo_entry_id']]
+            data = serializer.validated_data
+            data['showroom_object'] = activity
+            validated[(activity.id, data['source_repo_media_id'])] = data
+
+        activity_ids = {activity_id for activity_id, _media_id in validated}
+        existing = {
+            (medium.showroom_object_id, medium.source_repo_media_id): medium
+            for medium in Media.objects.filter(showroom_object_id__in=activity_ids)
+        }
+
+        now = timezone.now()
+        created = []
+        updated = []
+        for key, data in validated.items():
+            if (instance := existing.get(key)) is None:
+                instance = Media()
+                created.append(instance)
+            else:
+                updated.append(instance)
+            for field, value in data.items():
+                setattr(instance, field, value)
+            instance.modified = now
+
+        # only the last medium flagged as featured stays featured for each activity
+        featured = {}
+        for instance in created + updated:
+            if instance.featured:
+                featured[instance.showroom_object_id] = instance
+        for instance in created + updated:
+            if instance.featured and featured[instance.showroom_object_id] != instance:
+                instance.featured = False
+
+        with transaction.atomic():
+            Media.objects.bulk_create(created)
+            Media.objects.bulk_update(
+                updated,
+                [
+                    'type',
+                    'file',
+                    'mime_type',
+                    'exif',
+                    'license',
+                    'specifics',
+                    'featured',
+                    'order',
+                    'modified',
+                ],
+            )
+            if featured:
+                Media.objects.filter(showroom_object_id__in=featured.keys()).exclude(
+                    id__in=[instance.id for instance in featured.values()]
+                ).update(featured=False)
+            if delete_missing:
+                missing = [
+                    medium for key, medium in existing.items() if key not in validated
+                ]
+                Media.objects.filter(id__in=[medium.id for medium in missing]).delete()
+                response['deleted'] = [
+                    {'id': medium.source_repo_media_id, 'showroom_id': medium.id}
+                    for medium in missing
+                ]
+            # bulk operations do not send signals, so the activities' cached
+            # renderings have to be invalidated here
+            ShowroomObject.bump_cache_versions(activity_ids)
+
+        response['created'] = [
+            {'id': instance.source_repo_media_id, 'showroom_id': instance.id}
+            for instance in created
+        ]
+        response['updated'] = [
+            {'id': instance.source_repo_media_id, 'showroom_id': instance.id}
+            for instance in updated
+        ]
+        return Response(response, status=status.HTTP_201_CREATED)
+
     @extend_schema(
         tags=['repo'],
         parameters=[
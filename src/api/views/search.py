@@ -1,28 +1,38 @@
+import datetime
+import json
 import logging
 import re
 
 from drf_spectacular.extensions import OpenApiAuthenticationExtension
 from drf_spectacular.utils import OpenApiResponse, extend_schema
+from psycopg2.extras import DateRange
 from rest_framework import mixins, viewsets
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
 from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 
 from django.conf import settings
-from django.contrib.postgres.search import (
-    SearchQuery,
-    SearchRank,
-    SearchVector,
-    TrigramSimilarity,
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q, Value
+from django.db.models.functions import Coalesce
+
+from api.repositories.portfolio.search import (
+    SEARCH_ITEM_DEFERRED_FIELDS,
+    get_search_items,
 )
-from django.db.models import Min, Q
-
-from api.repositories.portfolio.search import get_search_item
 from api.repositories.portfolio.utils import get_usernames_from_roles
 from api.serializers.generic import Responses
 from api.serializers.search import SearchRequestSerializer, SearchResultSerializer
-from core.models import ShowroomObject
-from general.postgres import SearchVectorJSON
+from core.models import (
+    ActivityDetail,
+    ContributorActivityRelations,
+    DateSearchIndex,
+    Relation,
+    ShowroomObject,
+    TextSearchIndex,
+)
+from general.pagination import InvalidCursor, encode_cursor, filter_after_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -35,11 +45,8 @@ label_current_activities = {
     'de': 'Aktuelle Aktivitäten',
 }
 
-text_search_vectors = (
-    SearchVector('title', weight='A')
-    + SearchVectorJSON('subtext', weight='B')
-    + SearchVector('textsearchindex__text_vector', weight='C')
-)
+# words ending with an asterisk, which are not negated, are searched as prefixes
+prefix_pattern = re.compile(r'(?<![\w-])(\w+)\*')
 
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
@@ -83,17 +90,37 @@ class SearchViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
         limit = s.validated_data.get('limit')
         offset = s.validated_data.get('offset')
         order_by = s.validated_data.get('order_by')
+        cursor = s.validated_data.get('cursor')
+        facets = s.validated_data.get('facets')
         lang = request.LANGUAGE_CODE
 
         queryset = ShowroomObject.active_objects.all()
 
         return Response(
-            get_search_results(queryset, filters, limit, offset, order_by, lang),
+            get_search_results(
+                queryset,
+                filters,
+                limit,
+                offset,
+                order_by,
+                lang,
+                cursor=cursor,
+                facets=facets,
+            ),
             status=200,
         )
 
 
-def get_search_results(base_queryset, filters, limit, offset, order_by, lang):
+def get_search_results(
+    base_queryset, filters, limit, offset, order_by, lang, cursor=None, facets=False
+):
+    """Filter, order and paginate a search.
+
+    Results are paginated either by offset, or (if a cursor from the next
+    property of a previous result is provided) by keyset. In the latter case the
+    offset is ignored and the total is not counted. If facets is set, the facet
+    counts of the whole filtered result set are added.
+    """
     if offset is None:
         offset = 0
     elif offset < 0:
@@ -135,16 +162,22 @@ def get_search_results(base_queryset, filters, limit, offset, order_by, lang):
         else:
             q_filter = q_filter & append_filter
 
+    # all filters on related tables are EXISTS subqueries, so every object is
+    # contained only once and no distinct is needed
     if q_filter:
-        queryset = queryset.filter(q_filter).distinct()
+        queryset = queryset.filter(q_filter)
+    filtered = queryset
 
+    # every ordering ends with the id, so it is unique and can be used for cursors
+    ordering = ['id']
     if order_by:
         if order_by in ['title', '-title', 'date_changed', '-date_changed']:
-            queryset = queryset.order_by(order_by)
+            ordering = [order_by, 'id']
         elif order_by == 'currentness':
-            queryset = queryset.annotate(rank=Min('daterelevanceindex__rank')).order_by(
-                'rank', 'title', 'id'
-            )
+            # the lowest relevance rank is stored on the objects by the indexer, so
+            # this ordering can be read from an index instead of aggregating ranks
+            queryset = queryset.annotate(rank=F('currentness_rank'))
+            ordering = ['currentness_rank', 'title', 'id']
         elif order_by == 'rank':
             words = []
             for flt in filters:
@@ -161,23 +194,112 @@ def get_search_results(base_queryset, filters, limit, offset, order_by, lang):
                 #     'textsearchindex__text', query
                 # )
                 # rank = trigram_similarity_title + trigram_similarity_index
-                search_query = SearchQuery(query)
-                search_rank = SearchRank(text_search_vectors, search_query)
-                rank = trigram_similarity_title + search_rank
-
-                queryset = queryset.annotate(rank=rank).order_by('-rank')
-            else:
-                queryset.order_by()
-
-    count = queryset.count()
-    queryset = queryset.select_related()[offset : limit + offset]
-    results = [get_search_item(obj, lang) for obj in queryset]
-
-    return {
+                search_query = SearchQuery(
+                    query, config=settings.SEARCH_CONFIGS.get(lang, 'simple')
+                )
+                search_rank = SearchRank(
+                    F(ShowroomObject.search_document_field(lang)), search_query
+                )
+                # objects which are not indexed yet have no search document
+                rank = Coalesce(trigram_similarity_title + search_rank, Value(0.0))
+
+                queryset = queryset.annotate(rank=rank)
+                ordering = ['-rank', 'id']
+    queryset = queryset.order_by(*ordering).defer(*SEARCH_ITEM_DEFERRED_FIELDS)
+
+    if cursor:
+        try:
+            queryset = filter_after_cursor(queryset, ordering, cursor)
+        except InvalidCursor as err:
+            raise ParseError(str(err), 400) from err
+        count, count_exact = None, False
+        objects = list(queryset[:limit])
+    else:
+        count, count_exact = get_total(filtered, q_filter is not None)
+        objects = list(queryset[offset : limit + offset])
+    results = get_search_items(objects, lang)
+
+    ret = {
         'label': label_results_generic[lang],
         'total': count,
+        'total_exact': count_exact,
         'data': results,
+        'next': encode_cursor(objects[-1], ordering) if len(objects) == limit else None,
     }
+    if facets:
+        ret['facets'] = get_facets(filtered)
+    return ret
+
+
+def get_total(queryset, filtered):
+    """Count the results of a search, according to SEARCH_COUNT_STRATEGY.
+
+    Returns a tuple of the total and whether it is exact. Capped totals are
+    reported as SEARCH_COUNT_CAP, estimated totals are only used for searches
+    without filters.
+    """
+    strategy = settings.SEARCH_COUNT_STRATEGY
+    if strategy == 'exact':
+        return queryset.count(), True
+    cap = settings.SEARCH_COUNT_CAP
+    if strategy == 'estimate' and not filtered:
+        if (estimate := get_row_estimate(queryset)) > cap:
+            return estimate, False
+    count = queryset.values('id')[: cap + 1].count()
+    if count > cap:
+        return cap, False
+    return count, True
+
+
+def get_row_estimate(queryset):
+    """Return the query planner's estimate of the number of rows of a queryset."""
+    sql, params = queryset.values('id').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if type(plan) is str:
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def get_facets(queryset):
+    """Count the objects of a queryset per keyword, activity type and institution.
+
+    All counts are computed in a single grouped query. The ids of the counted
+    values are the same as the option ids of the corresponding search filters.
+    """
+    ids_sql, params = queryset.values('id').query.sql_with_params()
+    detail_table = ActivityDetail._meta.db_table
+    object_table = ShowroomObject._meta.db_table
+    sql = f"""
+        WITH ids AS ({ids_sql})
+        SELECT facet, value, COUNT(*) AS count FROM (
+            SELECT 'keyword' AS facet, keyword AS value
+            FROM {detail_table}, jsonb_object_keys(
+                CASE WHEN jsonb_typeof(keywords) = 'object' THEN keywords END
+            ) AS keyword
+            WHERE showroom_object_id IN (SELECT id FROM ids)
+            UNION ALL
+            SELECT 'activity_type', activity_type -> 'label' ->> %s
+            FROM {detail_table}
+            WHERE showroom_object_id IN (SELECT id FROM ids)
+            UNION ALL
+            SELECT 'institution', source_repo_id::text
+            FROM {object_table}
+            WHERE id IN (SELECT id FROM ids)
+        ) AS facet_values
+        WHERE value IS NOT NULL
+        GROUP BY facet, value
+        ORDER BY count DESC, value
+    """
+    ret = {'keyword': [], 'activity_type': [], 'institution': []}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, settings.LANGUAGE_CODE])
+        for facet, value, count in cursor.fetchall():
+            if facet == 'institution':
+                value = int(value)
+            ret[facet].append({'id': value, 'count': count})
+    return ret
 
 
 def get_fulltext_filter(values, lang):
@@ -185,14 +307,7 @@ def get_fulltext_filter(values, lang):
     for value in values:
         if type(value) is not str:
             raise ParseError('fulltext filter values have to be strings', 400)
-        add_filter = (
-            Q(title__icontains=value)
-            | Q(subtext__icontains=value)
-            | (
-                Q(textsearchindex__text__icontains=value)
-                & Q(textsearchindex__language=lang)
-            )
-        )
+        add_filter = get_text_filter(value, lang)
         if filters is None:
             filters = add_filter
         else:
@@ -200,6 +315,53 @@ def get_fulltext_filter(values, lang):
     return filters
 
 
+def get_text_filter(value, lang):
+    """Return a filter for objects containing a text in the requested language.
+
+    In full-text mode the value is matched against the search document of the
+    language, otherwise (or if the value is too short) as a substring of titles,
+    subtexts and indexed texts.
+    """
+    if (
+        settings.SEARCH_FULLTEXT
+        and len(value.strip()) >= settings.SEARCH_FULLTEXT_MIN_LENGTH
+    ):
+        field = ShowroomObject.search_document_field(lang)
+        return Q(**{field: get_search_query(value, lang)})
+    return (
+        Q(title__icontains=value)
+        | Q(subtext__icontains=value)
+        | Q(
+            Exists(
+                TextSearchIndex.objects.filter(
+                    showroom_object=OuterRef('pk'), language=lang, text__icontains=value
+                )
+            )
+        )
+    )
+
+
+def get_search_query(value, lang):
+    """Parse a text filter value into a full-text search query.
+
+    The value is parsed with the web search syntax (quoted phrases, or, -negation),
+    words ending with an asterisk are additionally required as prefixes.
+    """
+    config = settings.SEARCH_CONFIGS.get(lang, 'simple')
+    prefixes = prefix_pattern.findall(value)
+    text = prefix_pattern.sub(' ', value).strip()
+    search_query = None
+    if text:
+        search_query = SearchQuery(text, config=config, search_type='websearch')
+    for prefix in prefixes:
+        prefix_query = SearchQuery(f'{prefix}:*', config=config, search_type='raw')
+        if search_query is None:
+            search_query = prefix_query
+        else:
+            search_query = search_query & prefix_query
+    return search_query
+
+
 def get_activity_filter(values, lang):
     filters = None
     for value in values:
@@ -208,14 +370,7 @@ def get_activity_filter(values, lang):
                 'Only strings or dicts are allowed as activity filter parameters', 400
             )
         if type(value) is str:
-            add_filter = Q(type=ShowroomObject.ACTIVITY) & (
-                Q(title__icontains=value)
-                | Q(subtext__icontains=value)
-                | (
-                    Q(textsearchindex__text__icontains=value)
-                    & Q(textsearchindex__language=lang)
-                )
-            )
+            add_filter = Q(type=ShowroomObject.ACTIVITY) & get_text_filter(value, lang)
         else:
             obj_id = value.get('id')
             if not obj_id or type(obj_id) is not str:
@@ -230,7 +385,13 @@ def get_activity_filter(values, lang):
             contributor_ids = get_usernames_from_roles(activity)
             add_filter = (
                 Q(pk=obj_id)
-                | Q(relations_to__id=obj_id)
+                | Q(
+                    Exists(
+                        Relation.objects.filter(
+                            from_object=OuterRef('pk'), to_object_id=obj_id
+                        )
+                    )
+                )
                 | Q(
                     type=ShowroomObject.PERSON,
                     source_repo_object_id__in=contributor_ids,
@@ -257,14 +418,7 @@ def get_person_filter(values, lang):
                     ShowroomObject.DEPARTMENT,
                     ShowroomObject.INSTITUTION,
                 ]
-            ) & (
-                Q(title__icontains=value)
-                | Q(subtext__icontains=value)
-                | (
-                    Q(textsearchindex__text__icontains=value)
-                    & Q(textsearchindex__language=lang)
-                )
-            )
+            ) & get_text_filter(value, lang)
         else:
             obj_id = value.get('id')
             if not obj_id or type(obj_id) is not str:
@@ -278,7 +432,12 @@ def get_person_filter(values, lang):
             except ShowroomObject.DoesNotExist as err:
                 raise ParseError('requested person does not exist', 400) from err
             add_filter = Q(pk=obj_id) | Q(
-                related_usernames__contributor_source_id=person.source_repo_object_id
+                Exists(
+                    ContributorActivityRelations.objects.filter(
+                        activity=OuterRef('pk'),
+                        contributor_source_id=person.source_repo_object_id,
+                    )
+                )
             )
         if filters is None:
             filters = add_filter
@@ -303,9 +462,8 @@ def get_date_filter(values, lang):
                 'Only dates of format YYYY-MM-DD can be used as date filter values',
                 400,
             )
-        add_flt = Q(datesearchindex__date=value) | (
-            Q(daterangesearchindex__date_from__lte=value)
-            & Q(daterangesearchindex__date_to__gte=value)
+        add_flt = get_date_index_filter(
+            Q(date_range__contains=parse_filter_date(value))
         )
         if not flt:
             flt = add_flt
@@ -343,31 +501,16 @@ def get_daterange_filter(values, lang):
                 'At least one of the two date range parameters have to be valid dates',
                 400,
             )
-        # in case only date_from is provided, all dates in its future should be found
-        if not d_to:
-            add_flt = (
-                Q(datesearchindex__date__gte=d_from)
-                | Q(daterangesearchindex__date_from__gte=d_from)
-                | Q(daterangesearchindex__date_to__gte=d_from)
-            )
-        # in case only date_to is provided, all dates past this date should be found
-        elif not d_from:
-            add_flt = (
-                Q(datesearchindex__date__lte=d_to)
-                | Q(daterangesearchindex__date_from__lte=d_to)
-                | Q(daterangesearchindex__date_to__lte=d_to)
-            )
-        # if both parameters are provided, we search within the given date range
-        else:
-            add_flt = (
-                Q(datesearchindex__date__range=[d_from, d_to])
-                | Q(daterangesearchindex__date_from__range=[d_from, d_to])
-                | Q(daterangesearchindex__date_to__range=[d_from, d_to])
-                | Q(
-                    daterangesearchindex__date_from__lte=d_from,
-                    daterangesearchindex__date_to__gte=d_to,
-                )
-            )
+        d_from = parse_filter_date(d_from) if d_from else None
+        d_to = parse_filter_date(d_to) if d_to else None
+        if d_from and d_to and d_from > d_to:
+            raise ParseError('date_from has to be before or equal to date_to', 400)
+        # in case only date_from is provided, all dates in its future should be found,
+        # in case only date_to is provided, all dates past this date should be found,
+        # and if both parameters are provided, we search within the given date range
+        add_flt = get_date_index_filter(
+            Q(date_range__overlap=DateRange(d_from, d_to, '[]'))
+        )
         if not flt:
             flt = add_flt
         else:
@@ -376,6 +519,22 @@ def get_daterange_filter(values, lang):
     return flt
 
 
+def parse_filter_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError as err:
+        raise ParseError(f'{value} is not a valid date', 400) from err
+
+
+def get_date_index_filter(date_filter):
+    """Return a filter for objects with a matching date index."""
+    return Q(
+        Exists(
+            DateSearchIndex.objects.filter(date_filter, showroom_object=OuterRef('pk'))
+        )
+    )
+
+
 def get_keyword_filter(values, lang):
     if not values:
         raise ParseError('Keywords filter needs at least one value', 400)
@@ -4,14 +4,18 @@ from rest_framework.authentication import BasicAuthentication
 from rest_framework.response import Response
 
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 
-from api.repositories.portfolio.search import get_search_item
+from api.repositories.portfolio.search import (
+    SEARCH_ITEM_DEFERRED_FIELDS,
+    get_search_items,
+)
 from api.serializers.generic import Responses
 from api.serializers.search import SearchResultSerializer
 from api.serializers.showcase_search import ShowcaseSearchSerializer
 from api.views.search import CsrfExemptSessionAuthentication, label_results_generic
-from core.models import ShowroomObject
+from core.models import ShowroomObject, TextSearchIndex
+from general.pagination import InvalidCursor, encode_cursor, filter_after_cursor
 
 
 class ShowcaseSearchViewSet(viewsets.GenericViewSet):
@@ -37,6 +41,7 @@ class ShowcaseSearchViewSet(viewsets.GenericViewSet):
         sort = s.validated_data.get('sort')
         limit = s.validated_data.get('limit')
         offset = s.validated_data.get('offset')
+        cursor = s.validated_data.get('cursor')
         exclude = s.validated_data.get('exclude')
         entity_id = s.validated_data.get('entity_id')
         lang = request.LANGUAGE_CODE
@@ -79,22 +84,40 @@ class ShowcaseSearchViewSet(viewsets.GenericViewSet):
             q_filter = (
                 Q(title__icontains=q)
                 | Q(subtext__icontains=q)
-                | (
-                    Q(textsearchindex__text__icontains=q)
-                    & Q(textsearchindex__language=lang)
+                | Q(
+                    Exists(
+                        TextSearchIndex.objects.filter(
+                            showroom_object=OuterRef('pk'),
+                            language=lang,
+                            text__icontains=q,
+                        )
+                    )
                 )
             )
-            queryset = queryset.filter(q_filter).distinct()
+            queryset = queryset.filter(q_filter)
 
-        queryset = queryset.order_by(sort)
-        count = queryset.count()
-        queryset = queryset[offset : limit + offset]
+        # the id makes the ordering unique, so it can be used for cursors
+        ordering = [sort, 'id']
+        queryset = queryset.order_by(*ordering).defer(*SEARCH_ITEM_DEFERRED_FIELDS)
+        if cursor:
+            try:
+                queryset = filter_after_cursor(queryset, ordering, cursor)
+            except InvalidCursor as err:
+                return Response({'detail': str(err)}, status=400)
+            count = None
+            objects = list(queryset[:limit])
+        else:
+            count = queryset.count()
+            objects = list(queryset[offset : limit + offset])
 
         return Response(
             {
                 'label': label_results_generic[lang],
                 'total': count,
-                'data': [get_search_item(obj, lang) for obj in queryset],
+                'data': get_search_items(objects, lang),
+                'next': encode_cursor(objects[-1], ordering)
+                if len(objects) == limit
+                else None,
             },
             200,
         )
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import F, Q
 
 from .models import (
     ActivityDetail,
@@ -18,6 +19,22 @@ class SourceRepoAdmin(admin.ModelAdmin):
     repo_label.short_description = 'Source repository'
 
 
+class IndexPendingFilter(admin.SimpleListFilter):
+    title = 'index pending'
+    parameter_name = 'index_pending'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Yes'), ('no', 'No'))
+
+    def queryset(self, request, queryset):
+        pending = Q(date_indexed__isnull=True) | Q(date_indexed__lt=F('date_synced'))
+        if self.value() == 'yes':
+            return queryset.filter(pending)
+        if self.value() == 'no':
+            return queryset.exclude(pending)
+        return queryset
+
+
 class ShowroomObjectAdmin(admin.ModelAdmin):
     list_display = (
         'showroom_id',
@@ -29,9 +46,10 @@ class ShowroomObjectAdmin(admin.ModelAdmin):
         'date_created',
         'date_changed',
         'date_synced',
+        'index_pending',
         'active',
     )
-    list_filter = ('type', 'source_repo', 'active')
+    list_filter = ('type', 'source_repo', 'active', IndexPendingFilter)
     search_fields = (
         'title',
         'subtext',
@@ -41,6 +59,11 @@ class ShowroomObjectAdmin(admin.ModelAdmin):
         'source_repo_owner_id',
     )
 
+    def index_pending(self, obj):
+        return obj.index_pending
+
+    index_pending.boolean = True
+
 
 class ActivityDetailAdmin(admin.ModelAdmin):
     list_display = (
@@ -1,6 +1,7 @@
 import django_rq
 
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
@@ -29,6 +30,19 @@ class CoreConfig(AppConfig):
         },
     ]
 
+    # the vocabulary snapshot is only exported if a snapshot file is configured
+    if settings.VOCABULARY_SNAPSHOT_FILE:
+        jobs.append(
+            {
+                'id': 'export_vocabulary_snapshot',
+                'schedule': '15 3 * * *',
+                'function': 'api.repositories.portfolio.snapshot.export_snapshot',
+                'kwargs': {},
+            }
+        )
+    elif 'export_vocabulary_snapshot' in scheduler:
+        scheduler.cancel('export_vocabulary_snapshot')
+
     for job in jobs:
         if job['id'] not in scheduler:
             scheduler.cron(
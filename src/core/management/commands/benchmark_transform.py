@@ -0,0 +1,96 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.repositories.portfolio.transform import (
+    missing_transformers,
+    resolve_entities,
+    transform_data,
+    transform_plans,
+)
+
+SAMPLE_DATA = {
+    'data': {
+        'contributors': [
+            {
+                'label': 'Jane Doe',
+                'roles': [{'label': {'de': 'Mitwirkende', 'en': 'Contributor'}}],
+            },
+            {
+                'label': 'John Doe',
+                'roles': [{'label': {'de': 'Kurator', 'en': 'Curator'}}],
+            },
+        ],
+        'date': '2021-03-14',
+        'date_location': [
+            {'date': '2021-03-14', 'location': [{'label': 'Vienna'}]},
+        ],
+    },
+    'keywords': [
+        {'label': {'de': 'Malerei', 'en': 'Painting'}},
+        {'label': {'de': 'Fotografie', 'en': 'Photography'}},
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure how long the transformation of an activity takes for all schemas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-f',
+            '--file',
+            type=str,
+            help='JSON file with the repo data to transform. Default: sample data',
+            required=False,
+        )
+        parser.add_argument(
+            '-n',
+            '--number',
+            type=int,
+            help='Number of transformations per schema and measurement. Default: 200',
+            default=200,
+        )
+        parser.add_argument(
+            '-r',
+            '--repeat',
+            type=int,
+            help='Number of measurements, of which the best is used. Default: 5',
+            default=5,
+        )
+
+    def handle(self, *args, **options):
+        if options['number'] < 1 or options['repeat'] < 1:
+            raise CommandError('Number and repeat have to be positive numbers')
+        if path := options['file']:
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as err:
+                raise CommandError(f'Could not read repo data from {path}') from err
+        else:
+            data = SAMPLE_DATA
+
+        # entities are resolved once, so only the transformation itself is measured
+        entities = resolve_entities([data])
+        schemas = [
+            schema for schema in transform_plans if schema not in missing_transformers
+        ]
+
+        def transform_all():
+            for schema in schemas:
+                transform_data(data, schema, entities=entities)
+
+        # the first run loads all vocabulary labels into the caches
+        transform_all()
+        best = min(
+            timeit.repeat(
+                transform_all, number=options['number'], repeat=options['repeat']
+            )
+        )
+        per_activity = best / (options['number'] * len(schemas)) * 1e6
+        self.stdout.write(
+            f'{len(schemas)} schemas, {options["number"]} rounds, '
+            + f'best of {options["repeat"]}: {per_activity:.1f} us per activity'
+        )
@@ -2,8 +2,9 @@ from datetime import date
 from re import match
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from core.models import DateRelevanceIndex
+from core.models import DateRelevanceIndex, ShowroomObject
 
 
 class Command(BaseCommand):
@@ -29,7 +30,6 @@ class Command(BaseCommand):
             except ValueError as err:
                 raise CommandError('This does not look like a valid date') from err
 
-        dates = DateRelevanceIndex.objects.all()
-
-        for d in dates:
-            d.update_rank(day)
+        with transaction.atomic():
+            DateRelevanceIndex.update_ranks(DateRelevanceIndex.objects.all(), day)
+            ShowroomObject.update_currentness_ranks(ShowroomObject.objects.all())
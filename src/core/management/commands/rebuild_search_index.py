@@ -0,0 +1,192 @@
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from datetime import date
+from re import match
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.repositories.portfolio.search_indexer import index_activities, index_entity
+from core.models import ShowroomObject
+
+ENTITY_TYPES = [
+    ShowroomObject.PERSON,
+    ShowroomObject.DEPARTMENT,
+    ShowroomObject.INSTITUTION,
+]
+INDEXED_TYPES = [ShowroomObject.ACTIVITY] + ENTITY_TYPES
+
+
+def index_batch(ids):
+    """Rebuild the search indices of a batch of objects in a worker process.
+
+    Returns the number of indexed objects and the time it took in seconds.
+    """
+    start = time.monotonic()
+    objects = ShowroomObject.active_objects.filter(id__in=ids)
+    activities = list(
+        objects.filter(type=ShowroomObject.ACTIVITY).only('id', 'source_repo_data')
+    )
+    if activities:
+        index_activities(activities)
+    entities = objects.filter(
+        type__in=ENTITY_TYPES, entitydetail__isnull=False
+    ).select_related('entitydetail')
+    count = len(activities)
+    for entity in entities:
+        index_entity(entity)
+        count += 1
+    return count, time.monotonic() - start
+
+
+def iter_batches(queryset, batch_size):
+    """Stream the ids of a queryset with a server-side cursor, in batches."""
+    batch = []
+    for object_id in queryset.values_list('id', flat=True).iterator(
+        chunk_size=batch_size
+    ):
+        batch.append(object_id)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)['last_id']
+    except (ValueError, KeyError) as err:
+        raise CommandError(f'Invalid checkpoint file {path}') from err
+
+
+def write_checkpoint(path, last_id):
+    # write to a temporary file first, so an interrupted write cannot corrupt it
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump({'last_id': last_id}, f)
+    os.replace(f'{path}.tmp', path)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search indices of all active showroom objects'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-t',
+            '--type',
+            type=str,
+            help='Only index objects of this type. Can be used multiple times.',
+            choices=INDEXED_TYPES,
+            action='append',
+            required=False,
+        )
+        parser.add_argument(
+            '-r',
+            '--source-repo',
+            type=int,
+            help='Only index objects of the source repository with this ID',
+            required=False,
+        )
+        parser.add_argument(
+            '-s',
+            '--since',
+            type=str,
+            help='Only index objects changed since this date (YYYY-MM-DD)',
+            required=False,
+        )
+        parser.add_argument(
+            '-c',
+            '--checkpoint',
+            type=str,
+            help='File to store the progress in, to resume an interrupted rebuild',
+            required=False,
+        )
+        parser.add_argument(
+            '-w',
+            '--workers',
+            type=int,
+            help='Number of worker processes. Default: number of CPUs',
+            default=os.cpu_count() or 1,
+        )
+        parser.add_argument(
+            '-b',
+            '--batch-size',
+            type=int,
+            help='Number of objects indexed per batch. Default: 200',
+            default=200,
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('Workers and batch size have to be positive numbers')
+
+        queryset = ShowroomObject.active_objects.filter(
+            type__in=options['type'] or INDEXED_TYPES
+        )
+        if options['source_repo'] is not None:
+            queryset = queryset.filter(source_repo_id=options['source_repo'])
+        if options['since']:
+            if not match(r'^[0-9]{4}-[0-9]{2}-[0-9]{2}$', options['since']):
+                raise CommandError('This does not look like a valid date')
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError as err:
+                raise CommandError('This does not look like a valid date') from err
+            queryset = queryset.filter(date_changed__date__gte=since)
+        checkpoint = options['checkpoint']
+        if (last_id := read_checkpoint(checkpoint)) is not None:
+            self.stdout.write(f'Resuming after object {last_id}')
+            queryset = queryset.filter(id__gt=last_id)
+        queryset = queryset.order_by('id')
+
+        total = queryset.count()
+        self.stdout.write(f'Indexing {total} objects with {options["workers"]} workers')
+        # the workers are forked right away, so they do not share any database
+        # connection with this process, which streams the object ids
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(options['workers'])
+        done = 0
+        worker_time = 0
+        start = time.monotonic()
+        # batches are processed in parallel, but their results are collected in
+        # order, so the checkpoint always points to a fully indexed batch
+        pending = deque()
+        batches = iter_batches(queryset, options['batch_size'])
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                if not exhausted and len(pending) < 2 * options['workers']:
+                    if (batch := next(batches, None)) is None:
+                        exhausted = True
+                    else:
+                        result = pool.apply_async(index_batch, (batch,))
+                        pending.append((batch[-1], result))
+                    continue
+                last_id, result = pending.popleft()
+                count, seconds = result.get()
+                done += count
+                worker_time += seconds
+                if checkpoint:
+                    write_checkpoint(checkpoint, last_id)
+                elapsed = time.monotonic() - start
+                self.stdout.write(
+                    f'{done}/{total} objects indexed ({done / elapsed:.1f} objects/s)'
+                )
+        finally:
+            pool.terminate()
+            pool.join()
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.monotonic() - start
+        per_worker = done / worker_time if worker_time else 0
+        self.stdout.write(
+            f'Indexed {done} objects in {elapsed:.1f}s '
+            + f'({per_worker:.1f} objects/s per worker)'
+        )
@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.repositories.portfolio import prefetch_labels, vocabulary_index
+from api.repositories.portfolio.transform import (
+    enqueue_retransform_jobs,
+    plan_concepts,
+    retransform_activities_job,
+)
+from core.models import ShowroomObject
+
+
+class Command(BaseCommand):
+    help = 'Transform the display data of activities again from their repo data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-r',
+            '--source-repo',
+            type=int,
+            help='Only transform activities of the source repository with this ID',
+            required=False,
+        )
+        parser.add_argument(
+            '-s',
+            '--schema',
+            type=str,
+            help='Only transform activities of this schema',
+            choices=settings.ACTIVE_SCHEMAS,
+            required=False,
+        )
+        parser.add_argument(
+            '-q',
+            '--queue',
+            action='store_true',
+            help='Enqueue jobs for the workers instead of transforming right away',
+        )
+        parser.add_argument(
+            '-w',
+            '--workers',
+            type=int,
+            help='Number of worker processes. Default: number of CPUs',
+            default=os.cpu_count() or 1,
+        )
+        parser.add_argument(
+            '-b',
+            '--batch-size',
+            type=int,
+            help='Number of activities transformed per batch. Default: 200',
+            default=200,
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('Workers and batch size have to be positive numbers')
+
+        activities = ShowroomObject.active_objects.filter(type=ShowroomObject.ACTIVITY)
+        if options['source_repo'] is not None:
+            activities = activities.filter(source_repo_id=options['source_repo'])
+        if schema := options['schema']:
+            types = [
+                entry_type
+                for entry_type, entry_schema in vocabulary_index['schemas'].items()
+                if entry_schema == schema
+            ]
+            activities = activities.filter(
+                activitydetail__activity_type__source__in=types
+            )
+        activity_ids = list(activities.order_by('id').values_list('id', flat=True))
+
+        if options['queue']:
+            enqueue_retransform_jobs(activity_ids, options['batch_size'])
+            self.stdout.write(f'Enqueued {len(activity_ids)} activities')
+            return
+
+        batch_size = options['batch_size']
+        batches = [
+            activity_ids[i : i + batch_size]
+            for i in range(0, len(activity_ids), batch_size)
+        ]
+        self.stdout.write(
+            f'Transforming {len(activity_ids)} activities '
+            + f'with {options["workers"]} workers'
+        )
+        # the labels requested by the transformations are loaded once, so the
+        # workers forked afterwards already find them in their in-process cache
+        prefetch_labels(set().union(*plan_concepts.values()))
+        # the workers are forked after the vocabulary was loaded by this process,
+        # and they do not share any database connection with it
+        connections.close_all()
+        done = 0
+        start = time.monotonic()
+        with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+            for count in pool.imap_unordered(retransform_activities_job, batches):
+                done += count
+                elapsed = time.monotonic() - start
+                self.stdout.write(
+                    f'{done}/{len(activity_ids)} activities transformed '
+                    + f'({done / elapsed:.1f} activities/s)'
+                )
+        self.stdout.write(
+            f'Transformed {done} activities in {time.monotonic() - start:.1f}s'
+        )
@@ -0,0 +1,32 @@
+from requests import RequestException
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.repositories.portfolio.snapshot import export_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Export the used vocabulary and taxonomy data into a local snapshot file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-f',
+            '--file',
+            type=str,
+            help='The file to write the snapshot to. Default: VOCABULARY_SNAPSHOT_FILE',
+            required=False,
+        )
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.VOCABULARY_SNAPSHOT_FILE
+        if not path:
+            raise CommandError('No snapshot file configured or provided')
+        try:
+            data = export_snapshot(path)
+        except RequestException as err:
+            raise CommandError(f'Could not retrieve vocabulary data: {err}') from err
+        self.stdout.write(
+            f'Exported {len(data["collections"])} collections and '
+            + f'{len(data["labels"])} concepts to {path}'
+        )
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.13 on 2026-10-16 10:12
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_date_indexed(apps, schema_editor):
+    # all objects synced so far have been indexed synchronously
+    ShowroomObject = apps.get_model('core', 'ShowroomObject')
+    ShowroomObject.objects.update(date_indexed=F('date_synced'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_alter_media_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showroomobject',
+            name='date_indexed',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(set_date_indexed, migrations.RunPython.noop),
+    ]
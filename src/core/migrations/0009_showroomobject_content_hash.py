@@ -0,0 +1,18 @@
+# Generated by Django 3.2.13 on 2026-10-16 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_showroomobject_date_indexed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showroomobject',
+            name='content_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+    ]
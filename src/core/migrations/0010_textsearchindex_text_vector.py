@@ -0,0 +1,30 @@
+# Generated by Django 3.2.13 on 2026-10-16 21:40
+
+from django.db import migrations
+
+ENTITY_TYPES = ['per', 'ins', 'dep']
+
+
+def add_entity_titles(apps, schema_editor):
+    TextSearchIndex = apps.get_model('core', 'TextSearchIndex')
+    # entity titles were not part of the text index before, but are needed to find
+    # entities by name in full-text searches
+    for search_index in TextSearchIndex.objects.filter(
+        showroom_object__type__in=ENTITY_TYPES
+    ).select_related('showroom_object'):
+        search_index.text = '; '.join(
+            [search_index.showroom_object.title]
+            + ([search_index.text] if search_index.text else [])
+        )
+        search_index.save(update_fields=['text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_showroomobject_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_entity_titles, migrations.RunPython.noop),
+    ]
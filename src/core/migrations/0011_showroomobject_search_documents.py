@@ -0,0 +1,73 @@
+# Generated by Django 3.2.13 on 2026-10-16 22:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+# a copy of general.postgres.SearchVectorJSON, so this migration does not depend on
+# the current state of the application code
+class SearchVectorJSON(SearchVector):
+    def __init__(self, *expressions, **extra):
+        super().__init__(*expressions, **extra)
+        self.source_expressions = [
+            Coalesce(expression, Cast(Value('""'), JSONField()))
+            for expression in self._parse_expressions(*expressions)
+        ]
+
+
+def populate_search_documents(apps, schema_editor):
+    ShowroomObject = apps.get_model('core', 'ShowroomObject')
+    TextSearchIndex = apps.get_model('core', 'TextSearchIndex')
+    documents = {}
+    for lang, _lang_label in settings.LANGUAGES:
+        config = settings.SEARCH_CONFIGS.get(lang, 'simple')
+        text = Subquery(
+            TextSearchIndex.objects.filter(
+                showroom_object=OuterRef('pk'), language=lang
+            ).values('text')[:1]
+        )
+        documents[f'search_document_{lang}'] = (
+            SearchVector('title', weight='A', config=config)
+            + SearchVectorJSON('subtext', weight='B', config=config)
+            + SearchVector(text, weight='C', config=config)
+        )
+    ShowroomObject.objects.update(**documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_textsearchindex_text_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showroomobject',
+            name='search_document_de',
+            field=django.contrib.postgres.search.SearchVectorField(null=True),
+        ),
+        migrations.AddField(
+            model_name='showroomobject',
+            name='search_document_en',
+            field=django.contrib.postgres.search.SearchVectorField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='showroomobject',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_document_de'], name='core_showro_search__233f94_gin'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='showroomobject',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_document_en'], name='core_showro_search__d6b503_gin'
+            ),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
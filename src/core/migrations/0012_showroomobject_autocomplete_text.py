@@ -0,0 +1,61 @@
+# Generated by Django 3.2.13 on 2026-10-16 22:30
+
+import unicodedata
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+# a copy of general.utils.normalize_text, so this migration does not depend on the
+# current state of the application code
+def normalize_text(text):
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.split())
+
+
+def set_autocomplete_text(apps, schema_editor):
+    ShowroomObject = apps.get_model('core', 'ShowroomObject')
+    batch = []
+    for obj in ShowroomObject.objects.only('id', 'title', 'subtext').iterator():
+        texts = [obj.title]
+        if type(obj.subtext) is list:
+            texts.extend(text for text in obj.subtext if type(text) is str)
+        obj.autocomplete_text = normalize_text(' '.join(texts))
+        batch.append(obj)
+        if len(batch) >= 1000:
+            ShowroomObject.objects.bulk_update(batch, ['autocomplete_text'])
+            batch = []
+    ShowroomObject.objects.bulk_update(batch, ['autocomplete_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_showroomobject_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showroomobject',
+            name='autocomplete_text',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(set_autocomplete_text, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='showroomobject',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['autocomplete_text'],
+                name='core_showro_autocom_b00d58_gin',
+                opclasses=['gin_trgm_ops'],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='showroomobject',
+            index=models.Index(
+                fields=['autocomplete_text'],
+                name='core_showro_autocom_70d5bb_idx',
+                opclasses=['text_pattern_ops'],
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.13 on 2026-10-16 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_showroomobject_autocomplete_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showroomobject',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
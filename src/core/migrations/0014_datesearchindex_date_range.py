@@ -0,0 +1,51 @@
+# Generated by Django 3.2.13 on 2026-10-16 23:45
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+# single dates become ranges containing only this date; date ranges are moved over
+# from the date range index, with their bounds ordered as postgres requires
+POPULATE_DATE_RANGES = """
+UPDATE core_datesearchindex SET date_range = daterange(date, date, '[]');
+INSERT INTO core_datesearchindex (showroom_object_id, date, date_range)
+SELECT
+    showroom_object_id,
+    LEAST(date_from, date_to),
+    daterange(LEAST(date_from, date_to), GREATEST(date_from, date_to), '[]')
+FROM core_daterangesearchindex;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_showroomobject_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datesearchindex',
+            name='date_range',
+            field=django.contrib.postgres.fields.ranges.DateRangeField(null=True),
+        ),
+        migrations.RunSQL(POPULATE_DATE_RANGES, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='datesearchindex',
+            name='date_range',
+            field=django.contrib.postgres.fields.ranges.DateRangeField(),
+        ),
+        migrations.RemoveField(
+            model_name='datesearchindex',
+            name='date',
+        ),
+        migrations.AddIndex(
+            model_name='datesearchindex',
+            index=django.contrib.postgres.indexes.GistIndex(
+                fields=['date_range'], name='core_datese_date_ra_gist'
+            ),
+        ),
+        migrations.DeleteModel(
+            name='DateRangeSearchIndex',
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.13 on 2026-10-16 23:55
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+MAX_CURRENTNESS_RANK = 2147483647
+
+
+def populate_currentness_ranks(apps, schema_editor):
+    ShowroomObject = apps.get_model('core', 'ShowroomObject')
+    DateRelevanceIndex = apps.get_model('core', 'DateRelevanceIndex')
+    min_rank = (
+        DateRelevanceIndex.objects.filter(showroom_object=OuterRef('pk'))
+        .order_by('rank')
+        .values('rank')[:1]
+    )
+    ShowroomObject.objects.update(
+        currentness_rank=Coalesce(Subquery(min_rank), Value(MAX_CURRENTNESS_RANK))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_datesearchindex_date_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showroomobject',
+            name='currentness_rank',
+            field=models.IntegerField(default=2147483647, editable=False),
+        ),
+        migrations.RunPython(populate_currentness_ranks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='showroomobject',
+            index=models.Index(
+                fields=['active', 'type', 'currentness_rank', 'title', 'id'],
+                name='core_showro_active_f0066d_idx',
+            ),
+        ),
+    ]
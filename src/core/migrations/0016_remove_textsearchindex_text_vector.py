@@ -0,0 +1,21 @@
+# Generated by Django 3.2.13 on 2026-10-17 00:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_showroomobject_currentness_rank'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='textsearchindex',
+            name='core_textse_text_ve_25c111_gin',
+        ),
+        migrations.RemoveField(
+            model_name='textsearchindex',
+            name='text_vector',
+        ),
+    ]
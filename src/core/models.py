@@ -1,4 +1,4 @@
-from datetime import timedelta
+from datetime import date, timedelta
 from importlib import import_module
 
 from django_rq.queues import get_queue
@@ -6,14 +6,17 @@ from rq.exceptions import NoSuchJobError
 from rq.registry import ScheduledJobRegistry
 
 from django.conf import settings
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.fields import DateRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
 from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils.functional import cached_property
 
-from api.repositories.portfolio import activity_lists, get_schema
+from api.repositories.portfolio import activity_lists
 from api.repositories.user_preferences.transform import (
     update_entity_from_source_repo_data,
 )
@@ -23,7 +26,10 @@ from core.validators import (
     validate_showcase,
 )
 from general.models import AbstractBaseModel, ShortUUIDField
-from general.utils import slugify
+from general.postgres import DaysBetween
+from general.utils import normalize_text, slugify
+
+MAX_CURRENTNESS_RANK = 2147483647
 
 
 def get_default_list_ordering():
@@ -96,6 +102,18 @@ class ShowroomObject(AbstractBaseModel):
     source_repo_owner_id = models.CharField(max_length=255, blank=True, null=True)
     source_repo_data = models.JSONField(default=dict)
     date_synced = models.DateTimeField(editable=False, null=True)
+    date_indexed = models.DateTimeField(editable=False, null=True)
+    content_hash = models.CharField(max_length=64, editable=False, null=True)
+    # weighted full-text search documents (title, subtext and text index) per language
+    search_document_de = SearchVectorField(null=True)
+    search_document_en = SearchVectorField(null=True)
+    # normalized title and subtext for autocomplete lookups
+    autocomplete_text = models.TextField(default='', editable=False)
+    # incremented on every change of the object, its details or media, so that
+    # cached renderings of outdated versions are not used anymore
+    cache_version = models.PositiveIntegerField(default=0, editable=False)
+    # the lowest rank in the date relevance index, used for the currentness ordering
+    currentness_rank = models.IntegerField(default=MAX_CURRENTNESS_RANK, editable=False)
 
     belongs_to = models.ForeignKey(
         'self', on_delete=models.SET_NULL, null=True, blank=True
@@ -117,7 +135,20 @@ class ShowroomObject(AbstractBaseModel):
     class Meta:
         indexes = [
             GinIndex(fields=['title']),
+            GinIndex(fields=['search_document_de']),
+            GinIndex(fields=['search_document_en']),
+            GinIndex(
+                fields=['autocomplete_text'],
+                name='core_showro_autocom_b00d58_gin',
+                opclasses=['gin_trgm_ops'],
+            ),
+            models.Index(
+                fields=['autocomplete_text'],
+                name='core_showro_autocom_70d5bb_idx',
+                opclasses=['text_pattern_ops'],
+            ),
             models.Index(fields=['source_repo_object_id']),
+            models.Index(fields=['active', 'type', 'currentness_rank', 'title', 'id']),
         ]
         unique_together = ('source_repo', 'source_repo_object_id')
 
@@ -127,15 +158,56 @@ class ShowroomObject(AbstractBaseModel):
             label = f'{label} (deactivated)'
         return label
 
+    @staticmethod
+    def search_document_field(lang):
+        """Return the name of the search document field for a language."""
+        return f'search_document_{lang}'
+
+    def get_autocomplete_text(self):
+        """Return the normalized title and subtext of this object."""
+        texts = [self.title]
+        if type(self.subtext) is list:
+            texts.extend(text for text in self.subtext if type(text) is str)
+        return normalize_text(' '.join(texts))
+
+    @staticmethod
+    def bump_cache_versions(ids):
+        """Invalidate the cached renderings of the objects with the given ids."""
+        ShowroomObject.objects.filter(id__in=ids).update(
+            cache_version=models.F('cache_version') + 1
+        )
+
+    @staticmethod
+    def update_currentness_ranks(queryset):
+        """Store the lowest date relevance rank on every object of a queryset.
+
+        Only objects whose rank changed are written. Returns their number.
+        """
+        min_rank = (
+            DateRelevanceIndex.objects.filter(showroom_object=OuterRef('pk'))
+            .order_by('rank')
+            .values('rank')[:1]
+        )
+        # objects without dates get the lowest possible relevance
+        rank = Coalesce(Subquery(min_rank), models.Value(MAX_CURRENTNESS_RANK))
+        return queryset.exclude(currentness_rank=rank).update(currentness_rank=rank)
+
     def save(self, *args, **kwargs):
+        self.autocomplete_text = self.get_autocomplete_text()
         old_instance = None
         if self.id:
             try:
                 old_instance = ShowroomObject.objects.get(id=self.id)
             except ShowroomObject.DoesNotExist:
                 pass
+        if old_instance is not None:
+            # increment the version in the database, so concurrent changes are
+            # not overwritten with an outdated version
+            self.cache_version = models.F('cache_version') + 1
 
         super().save(*args, **kwargs)
+        if old_instance is not None:
+            self.refresh_from_db(fields=['cache_version'])
 
         # in case the object was just created, we have to generate a new showroom_id
         if old_instance is None:
@@ -156,6 +228,15 @@ class ShowroomObject(AbstractBaseModel):
                     object=self,
                 )
 
+    @property
+    def index_pending(self):
+        """Whether the search indices do not yet reflect the last sync."""
+        if self.date_indexed is None:
+            return True
+        if self.date_synced is None:
+            return False
+        return self.date_indexed < self.date_synced
+
     def generate_showroom_id(self, char_limit=4):
         if self.type in [self.PERSON, self.INSTITUTION, self.DEPARTMENT]:
             # for entities the showroom id should be their slugified name plus the first
@@ -178,22 +259,27 @@ class ShowroomObject(AbstractBaseModel):
             self.showroom_id = self.id
 
     def get_showcase_date_info(self):
-        dates = [f'{d.date}' for d in self.datesearchindex_set.order_by('date')]
-        for d in self.daterangesearchindex_set.order_by('date_from'):
-            if (
-                d.date_from.day == 1
-                and d.date_from.month == 1
-                and d.date_to.day == 31
-                and d.date_to.month == 12
+        dates = []
+        date_ranges = []
+        for d in self.datesearchindex_set.order_by('date_range'):
+            # date ranges are returned with an exclusive upper bound
+            date_from = d.date_range.lower
+            date_to = d.date_range.upper - timedelta(days=1)
+            if date_from == date_to:
+                dates.append(f'{date_from}')
+            elif (
+                date_from.day == 1
+                and date_from.month == 1
+                and date_to.day == 31
+                and date_to.month == 12
             ):
-                d_from_year = d.date_from.year
-                d_to_year = d.date_to.year
-                if d_from_year == d_to_year:
-                    dates.append(f'{d_from_year}')
+                if date_from.year == date_to.year:
+                    date_ranges.append(f'{date_from.year}')
                 else:
-                    dates.append(f'{d_from_year} - {d_to_year}')
+                    date_ranges.append(f'{date_from.year} - {date_to.year}')
             else:
-                dates.append(f'{d.date_from} - {d.date_to}')
+                date_ranges.append(f'{date_from} - {date_to}')
+        dates.extend(date_ranges)
         ret = ', '.join(dates)
         return ret
 
@@ -228,6 +314,7 @@ class ShowroomObject(AbstractBaseModel):
         self.locations = []
         self.source_repo_data = {}
         self.belongs_to = None
+        self.currentness_rank = MAX_CURRENTNESS_RANK
         self.save()
 
         if self.type in entity_types:
@@ -247,7 +334,6 @@ class ShowroomObject(AbstractBaseModel):
 
         self.textsearchindex_set.all().delete()
         self.datesearchindex_set.all().delete()
-        self.daterangesearchindex_set.all().delete()
         self.daterelevanceindex_set.all().delete()
 
         self.media_set.all().delete()
@@ -332,20 +418,11 @@ class EntityDetail(models.Model):
     def render_contributor_activities(self):
         activities = ShowroomObject.active_objects.filter(
             related_usernames__contributor_source_id=self.showroom_object.source_repo_object_id
-        )
-        for activity in activities:
-            schema = get_schema(activity.activitydetail.activity_type.get('source'))
-            if schema is None:
-                schema = '__none__'
-            # we have to import the transform module dynamically to not produce a
-            # circular import
-            transform = import_module('api.repositories.portfolio.transform')
-            # now transform the detail fields and store the activity with the new data
-            transformed = transform.transform_data(activity.source_repo_data, schema)
-            activity.primary_details = transformed.get('primary_details')
-            activity.secondary_details = transformed.get('secondary_details')
-            activity.list = transformed.get('list')
-            activity.save()
+        ).select_related('activitydetail')
+        # we have to import the transform module dynamically to not produce a
+        # circular import
+        transform = import_module('api.repositories.portfolio.transform')
+        transform.retransform_activities(list(activities))
 
     def render_list(self):
         activities = ShowroomObject.active_objects.filter(
@@ -463,40 +540,55 @@ class TextSearchIndex(models.Model):
     showroom_object = models.ForeignKey(ShowroomObject, on_delete=models.CASCADE)
     language = models.CharField(max_length=255)
     text = models.TextField(default='')
-    text_vector = SearchVectorField(null=True)
-
-    class Meta:
-        indexes = (GinIndex(fields=['text_vector']),)
 
 
 class DateSearchIndex(models.Model):
     id = models.AutoField(primary_key=True)
     showroom_object = models.ForeignKey(ShowroomObject, on_delete=models.CASCADE)
-    date = models.DateField()
+    # single dates are stored as ranges containing only this date
+    date_range = DateRangeField()
 
-
-class DateRangeSearchIndex(models.Model):
-    id = models.AutoField(primary_key=True)
-    showroom_object = models.ForeignKey(ShowroomObject, on_delete=models.CASCADE)
-    date_from = models.DateField()
-    date_to = models.DateField()
+    class Meta:
+        indexes = [
+            GistIndex(fields=['date_range'], name='core_datese_date_ra_gist'),
+        ]
 
 
 class DateRelevanceIndex(models.Model):
+    MAX_RANK = MAX_CURRENTNESS_RANK
+
     id = models.AutoField(primary_key=True)
     showroom_object = models.ForeignKey(ShowroomObject, on_delete=models.CASCADE)
     date = models.DateField()
-    rank = models.IntegerField(default=2147483647)
+    rank = models.IntegerField(default=MAX_RANK)
+
+    @staticmethod
+    def update_ranks(queryset, reference_date):
+        """Recalculate the ranks of all dates in a queryset with a single update.
 
-    def update_rank(self, reference_date):
-        # after bulk creates date is a string not a date object, therefore refresh
-        if type(self.date) is str:
-            self.refresh_from_db()
-        rank = (self.date - reference_date).days
+        This computes the same ranks as calculate_rank, but in the database.
+        """
+        days = DaysBetween(
+            models.F('date'),
+            models.Value(reference_date, output_field=models.DateField()),
+        )
+        queryset.update(
+            rank=models.Case(
+                models.When(date__gte=reference_date, then=days),
+                default=-days * settings.CURRENTNESS_PAST_WEIGHT,
+                output_field=models.IntegerField(),
+            )
+        )
+
+    @staticmethod
+    def calculate_rank(value, reference_date):
+        """Calculate the currentness rank of a date (or an ISO date string)."""
+        if type(value) is str:
+            value = date.fromisoformat(value)
+        rank = (value - reference_date).days
         if rank < 0:
             rank = (-rank) * settings.CURRENTNESS_PAST_WEIGHT
-        self.rank = rank
-        self.save()
+        return rank
 
 
 class Media(models.Model):
@@ -568,3 +660,49 @@ class ContributorActivityRelations(AbstractBaseModel):
         ]
 
         unique_together = ('contributor_source_id', 'activity')
+
+
+@receiver(
+    post_save,
+    sender=SourceRepository,
+    dispatch_uid='post_save_source_repository_bump_cache_version',
+)
+def bump_source_repository_cache_versions(sender, instance, created, raw, **kwargs):
+    # the labels and icon of the source repository are part of cached renderings
+    if raw or created:
+        return
+    ShowroomObject.objects.filter(source_repo=instance).update(
+        cache_version=models.F('cache_version') + 1
+    )
+
+
+@receiver(
+    post_save,
+    sender=EntityDetail,
+    dispatch_uid='post_save_entity_detail_bump_cache_version',
+)
+@receiver(
+    post_save,
+    sender=ActivityDetail,
+    dispatch_uid='post_save_activity_detail_bump_cache_version',
+)
+def bump_detail_cache_version(sender, instance, raw, *args, **kwargs):
+    if raw:
+        return
+    ShowroomObject.bump_cache_versions([instance.showroom_object_id])
+
+
+@receiver(
+    post_save,
+    sender=Media,
+    dispatch_uid='post_save_media_bump_cache_version',
+)
+@receiver(
+    post_delete,
+    sender=Media,
+    dispatch_uid='post_delete_media_bump_cache_version',
+)
+def bump_media_cache_version(sender, instance, *args, **kwargs):
+    if kwargs.get('raw'):
+        return
+    ShowroomObject.bump_cache_versions([instance.showroom_object_id])
@@ -1,6 +1,5 @@
 from django.conf import settings
 from django.contrib.sitemaps import Sitemap
-from django.db.models import Min
 
 from core.models import ShowroomObject
 
@@ -15,9 +14,7 @@ class ActivitiesSitemap(Sitemap):
     def items(self):
         """Returns a limited queryset of activities, ordered by currentness."""
         q = ShowroomObject.objects.filter(type=ShowroomObject.ACTIVITY)
-        q = q.annotate(rank=Min('daterelevanceindex__rank')).order_by(
-            'rank', 'title', 'id'
-        )
+        q = q.order_by('currentness_rank', 'title', 'id')
         return q[: settings.SITEMAP_ACTIVITIES_LIMIT]
 
     def location(self, item):
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TieredCache:
+    """A bounded in-process LRU cache in front of a Django cache.
+
+    Values are first looked up in the local LRU, where they are kept for
+    local_timeout seconds, and only then in the (shared) backend cache.
+    The counters local_hits, hits and misses can be used to check how
+    many lookups had to go to the backend, and how many of those failed.
+    """
+
+    def __init__(self, backend, maxsize=10000, local_timeout=300):
+        self.backend = backend
+        self.maxsize = maxsize
+        self.local_timeout = local_timeout
+        self.local_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.local_hits += 1
+            return value
+
+    def _set_local(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.local_timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        if (value := self._get_local(key)) is not None:
+            return value
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._set_local(key, value)
+        return value
+
+    def get_many(self, keys):
+        """Return a dict of all keys that could be found in one of the caches."""
+        found = {}
+        remaining = []
+        for key in keys:
+            if (value := self._get_local(key)) is not None:
+                found[key] = value
+            else:
+                remaining.append(key)
+        if remaining:
+            values = self.backend.get_many(remaining)
+            self.hits += len(values)
+            self.misses += len(remaining) - len(values)
+            for key, value in values.items():
+                self._set_local(key, value)
+            found.update(values)
+        return found
+
+    def set(self, key, value, timeout):
+        self.backend.set(key, value, timeout)
+        self._set_local(key, value)
+
+    def clear_local(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'local_hits': self.local_hits,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
@@ -0,0 +1,115 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+INTEGER_FIELD_TYPES = {
+    'AutoField',
+    'BigAutoField',
+    'BigIntegerField',
+    'IntegerField',
+    'PositiveBigIntegerField',
+    'PositiveIntegerField',
+    'PositiveSmallIntegerField',
+    'SmallAutoField',
+    'SmallIntegerField',
+}
+NUMBER_FIELD_TYPES = {'DecimalField', 'FloatField'}
+DATE_FIELD_TYPES = {'DateField', 'DateTimeField'}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_ordering_keys(order_by):
+    """Return the (field, descending) keys of an ordering, for keyset pagination.
+
+    The ordering has to be unique, which is why it should end with the id.
+    """
+    return [(field.lstrip('-'), field.startswith('-')) for field in order_by]
+
+
+def encode_cursor(obj, order_by):
+    """Create an opaque cursor pointing right after obj in the given ordering."""
+    values = []
+    for field, _descending in get_ordering_keys(order_by):
+        value = getattr(obj, field)
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            value = value.isoformat()
+        values.append(value)
+    data = json.dumps({'o': order_by, 'v': values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, order_by):
+    """Return the ordering values stored in a cursor.
+
+    Raises InvalidCursor, if the cursor is malformed or was created for another
+    ordering.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = data['v']
+        cursor_order_by = data['o']
+    except (ValueError, TypeError, KeyError) as err:
+        raise InvalidCursor('malformed cursor') from err
+    if cursor_order_by != list(order_by) or len(values) != len(order_by):
+        raise InvalidCursor('cursor does not match the requested ordering')
+    return values
+
+
+def get_ordering_field(queryset, name):
+    """Return the model field or the annotation an ordering key refers to."""
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    return queryset.model._meta.get_field(name)
+
+
+def parse_cursor_value(field, value):
+    """Convert a decoded cursor value to the type of its ordering field.
+
+    Raises InvalidCursor, if the value does not match the field's type.
+    """
+    internal_type = field.get_internal_type()
+    if internal_type in INTEGER_FIELD_TYPES:
+        valid = type(value) is int
+    elif internal_type in NUMBER_FIELD_TYPES:
+        valid = type(value) in (int, float)
+    else:
+        valid = type(value) is str
+    if not valid:
+        raise InvalidCursor('cursor does not match the requested ordering')
+    if internal_type in DATE_FIELD_TYPES:
+        try:
+            value = field.to_python(value)
+        except ValidationError as err:
+            raise InvalidCursor('malformed cursor') from err
+    return value
+
+
+def filter_after_cursor(queryset, order_by, cursor):
+    """Filter a queryset to the objects following a cursor in the given ordering.
+
+    None of the ordering fields may be null. Raises InvalidCursor, if the cursor
+    is malformed or its values do not match the types of the ordering fields.
+    """
+    keys = get_ordering_keys(order_by)
+    values = [
+        parse_cursor_value(get_ordering_field(queryset, field), value)
+        for (field, _descending), value in zip(keys, decode_cursor(cursor, order_by))
+    ]
+    q_filter = None
+    for i, (field, descending) in enumerate(keys):
+        lookup = 'lt' if descending else 'gt'
+        add_filter = Q(**{f'{field}__{lookup}': values[i]})
+        for j in range(i):
+            add_filter &= Q(**{keys[j][0]: values[j]})
+        if q_filter is None:
+            q_filter = add_filter
+        else:
+            q_filter = q_filter | add_filter
+    return queryset.filter(q_filter)
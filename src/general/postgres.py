@@ -1,6 +1,7 @@
 from django.contrib.postgres.fields import JSONField
 from django.contrib.postgres.search import SearchVector
-from django.db.models.expressions import Value
+from django.db.models import BooleanField, DateField, IntegerField
+from django.db.models.expressions import Func, Value
 from django.db.models.functions import Cast, Coalesce
 
 
@@ -11,3 +12,26 @@ class SearchVectorJSON(SearchVector):
             Coalesce(expression, Cast(Value('""'), JSONField()))
             for expression in self._parse_expressions(*expressions)
         ]
+
+
+class RangeUpper(Func):
+    """The (exclusive) upper bound of a date range."""
+
+    function = 'upper'
+    output_field = DateField()
+
+
+class DaysBetween(Func):
+    """The number of days from the second to the first of two dates."""
+
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '
+    output_field = IntegerField()
+
+
+class IsDistinctFrom(Func):
+    """Whether two values differ, with null values being equal to each other."""
+
+    template = '(%(expressions)s)'
+    arg_joiner = ' IS DISTINCT FROM '
+    output_field = BooleanField()
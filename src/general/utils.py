@@ -1,5 +1,6 @@
 import codecs
 import re
+import unicodedata
 
 import translitcodec  # noqa: F401
 from slugify import slugify as python_slugify
@@ -32,3 +33,10 @@ def slugify(text, separator='-', style=None):
         return python_slugify(text, separator=separator, allow_unicode=True)
     else:
         return python_slugify(text)
+
+
+def normalize_text(text):
+    """Normalize a text for case and accent insensitive matching."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.split())
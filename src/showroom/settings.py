@@ -163,6 +163,10 @@ TAX_ID = 'potax'
 TAX_GRAPH = 'http://base.uni-ak.ac.at/portfolio/taxonomy/'
 VOC_ID = 'povoc'
 VOC_GRAPH = 'http://base.uni-ak.ac.at/portfolio/vocabulary/'
+VOCABULARY_SNAPSHOT_FILE = env.str(
+    'VOCABULARY_SNAPSHOT_FILE',
+    default=os.path.join(BASE_DIR, 'assets', 'vocabulary_snapshot.json'),
+)
 ACTIVE_SCHEMAS = env.list(
     'ACTIVE_SCHEMAS',
     default=[
@@ -190,6 +194,23 @@ ACTIVE_SCHEMAS = env.list(
 # The default limit for searches, when no limit parameter is provided
 SEARCH_LIMIT = env.int('SEARCH_LIMIT', default=100)
 
+# Whether text filters should be matched against the full-text search index. If
+# disabled, all text filters are matched as substrings
+SEARCH_FULLTEXT = env.bool('SEARCH_FULLTEXT', default=True)
+
+# Text filter values shorter than this are matched as substrings, also in full-text mode
+SEARCH_FULLTEXT_MIN_LENGTH = env.int('SEARCH_FULLTEXT_MIN_LENGTH', default=3)
+
+# How the total of search results is counted: exact, capped (count up to
+# SEARCH_COUNT_CAP results) or estimate (like capped, but searches without filters
+# use the query planner's estimate, if it exceeds SEARCH_COUNT_CAP)
+SEARCH_COUNT_STRATEGY = env.str('SEARCH_COUNT_STRATEGY', default='exact')
+if SEARCH_COUNT_STRATEGY not in ['exact', 'capped', 'estimate']:
+    raise ImproperlyConfigured(
+        'SEARCH_COUNT_STRATEGY has to be one of: exact, capped, estimate'
+    )
+SEARCH_COUNT_CAP = env.int('SEARCH_COUNT_CAP', default=10000)
+
 # Factor by which past dates are multiplied for currentness search
 CURRENTNESS_PAST_WEIGHT = env.int('CURRENTNESS_PAST_WEIGHT', default=4)
 
@@ -334,6 +355,12 @@ LANGUAGES = (
 
 LANGUAGES_DICT = dict(LANGUAGES)
 
+# The Postgres text search configurations used for the full-text search index
+SEARCH_CONFIGS = {
+    'de': 'german',
+    'en': 'english',
+}
+
 LOCALES = {
     'de': 'de_DE',
     'en': 'en_GB',
@@ -500,6 +527,7 @@ RQ_EXCEPTION_HANDLERS = ['general.rq.handlers.exception_handler']
 RQ_FAILURE_TTL = 2628288  # approx. 3 month
 
 WORKER_DELAY_ENTITY = env.int('WORKER_DELAY_ENTITY', default=10)
+WORKER_DELAY_INDEX = env.int('WORKER_DELAY_INDEX', default=5)
 """Session settings."""
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'